@@ -0,0 +1,109 @@
+import re
+import threading
+from cachetools import TTLCache
+
+
+class ResponseCache:
+    """TTL and LRU bounded cache of responses keyed by normalized text, with hit/miss counters"""
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 1024,
+        ttl: float = 3600,
+        fuzzy: bool = False,
+        fuzzy_max_chars: int = 40,
+        max_key_chars: int = 500,
+    ):
+        """
+        Args:
+            name (str): Cache name used in stats.
+            maxsize (int): Maximum entries, least recently used are dropped first.
+            ttl (float): Seconds an entry stays valid.
+            fuzzy (bool): Also match short inputs with the same simplified key, e.g. "hiii!" and "hi".
+            fuzzy_max_chars (int): Only inputs up to this length are matched fuzzily.
+            max_key_chars (int): Longer inputs are never cached.
+        """
+        self.name = name
+        self.fuzzy = fuzzy
+        self.fuzzy_max_chars = fuzzy_max_chars
+        self.max_key_chars = max_key_chars
+        self.__lock = threading.Lock()
+        self.__cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Simplified key of each short entry, kept at insert time so lookups never scan the cache
+        self.__fuzzy_keys = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.__stats = {"hits": 0, "fuzzy_hits": 0, "misses": 0}
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Case, surrounding punctuation and whitespace insensitive key"""
+        text = re.sub(r"\s+", " ", text.strip().lower())
+        return re.sub(r"^[\W_]+|[\W_]+$", "", text) or text
+
+    @staticmethod
+    def simplify(text: str) -> str:
+        """Fuzzy key: letters and digits only, repeated characters collapsed"""
+        return re.sub(r"(.)\1+", r"\1", re.sub(r"[\W_]+", "", text))
+
+    def get(self, text: str):
+        key = self.normalize(text)
+
+        if len(key) > self.max_key_chars:
+            return None
+
+        with self.__lock:
+            value = self.__cache.get(key)
+
+            if value is not None:
+                self.__stats["hits"] += 1
+                return value
+
+            if self.fuzzy and len(key) <= self.fuzzy_max_chars:
+                value = self.__get_fuzzy(key)
+
+                if value is not None:
+                    self.__stats["fuzzy_hits"] += 1
+                    return value
+
+            self.__stats["misses"] += 1
+
+        return None
+
+    def set(self, text: str, value) -> None:
+        key = self.normalize(text)
+
+        if len(key) > self.max_key_chars:
+            return
+
+        with self.__lock:
+            self.__cache[key] = value
+
+            if self.fuzzy and len(key) <= self.fuzzy_max_chars and (simplified := self.simplify(key)):
+                self.__fuzzy_keys[simplified] = key
+
+    def get_stats(self) -> dict:
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["entries"] = len(self.__cache)
+
+        lookups = stats["hits"] + stats["fuzzy_hits"] + stats["misses"]
+        stats["name"] = self.name
+        stats["hit_ratio"] = (stats["hits"] + stats["fuzzy_hits"]) / lookups if lookups else 0.0
+
+        return stats
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__cache.clear()
+            self.__fuzzy_keys.clear()
+
+    def __get_fuzzy(self, key: str):
+        simplified = self.simplify(key)
+
+        if not simplified:
+            return None
+
+        # Exact match only, similar but different words like "hell" and "hello" must not share answers
+        candidate = self.__fuzzy_keys.get(simplified)
+
+        return self.__cache.get(candidate) if candidate is not None else None
@@ -0,0 +1 @@
+from .ResponseCache import ResponseCache
@@ -1,14 +1,53 @@
+import time
+from collections.abc import Iterator
 from functools import wraps
 from app.common.log import logger
+from app.common.metrics import latency_registry
 
 
 def func_logger(func):
-    """Function logger"""
+    """
+    Function logger, also records wall time and exceptions into the latency registry.
+
+    When the function returns a stream, its full duration is recorded once the stream ends
+    and the time to its first chunk under `<name>[first_chunk]`.
+    """
+    name = func.__qualname__
 
     @wraps(func)
     def wrapper(*args, **kwargs):
         """Wrapper"""
         logger.info(f"\x1b[6;30;42m {func.__name__} \x1b[0m")
-        return func(*args, **kwargs)
+        start = time.perf_counter()
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            latency_registry.record(name, time.perf_counter() - start, exception=e)
+            raise
+
+        if isinstance(result, Iterator):
+            return _record_stream(result, name, start)
+
+        latency_registry.record(name, time.perf_counter() - start)
+        return result
 
     return wrapper
+
+
+def _record_stream(stream: Iterator, name: str, start: float) -> Iterator:
+    error = None
+    first_chunk = True
+
+    try:
+        for chunk in stream:
+            if first_chunk:
+                latency_registry.record(f"{name}[first_chunk]", time.perf_counter() - start)
+                first_chunk = False
+
+            yield chunk
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        latency_registry.record(name, time.perf_counter() - start, exception=error)
@@ -0,0 +1,78 @@
+OPENAI_MODEL_CONTEXT_ENUM = {
+    "gpt-3.5-turbo": {
+        "context": 16385,
+        "max_output": 4096,
+    },
+    "gpt-3.5-turbo-0301": {
+        "context": 4096,
+        "max_output": 4096,
+    },
+    "gpt-3.5-turbo-0613": {
+        "context": 4096,
+        "max_output": 4096,
+    },
+    "gpt-3.5-turbo-16k-0613": {
+        "context": 16385,
+        "max_output": 4096,
+    },
+    "gpt-4": {
+        "context": 8192,
+        "max_output": 8192,
+    },
+    "gpt-4-32k": {
+        "context": 32768,
+        "max_output": 8192,
+    },
+    "gpt-4-turbo": {
+        "context": 128000,
+        "max_output": 4096,
+    },
+    "gpt-4-turbo-2024-04-09": {
+        "context": 128000,
+        "max_output": 4096,
+    },
+    "gpt-4-turbo-32k": {
+        "context": 32768,
+        "max_output": 4096,
+    },
+    "gpt-4-vision-preview": {
+        "context": 128000,
+        "max_output": 4096,
+    },
+    "gpt-4o": {
+        "context": 128000,
+        "max_output": 16384,
+    },
+    "gpt-4o-2024-05-13": {
+        "context": 128000,
+        "max_output": 4096,
+    },
+    "gpt-4o-2024-08-06": {
+        "context": 128000,
+        "max_output": 16384,
+    },
+    "gpt-4o-mini": {
+        "context": 128000,
+        "max_output": 16384,
+    },
+    "gpt-4o-mini-2024-07-18": {
+        "context": 128000,
+        "max_output": 16384,
+    },
+    "o1-preview": {
+        "context": 128000,
+        "max_output": 32768,
+    },
+    "o1-preview-2024-09-12": {
+        "context": 128000,
+        "max_output": 32768,
+    },
+    "o1-mini": {
+        "context": 128000,
+        "max_output": 65536,
+    },
+    "o1-mini-2024-09-12": {
+        "context": 128000,
+        "max_output": 65536,
+    },
+}
@@ -1,4 +1,5 @@
 from .OpenAIErrorMessageEnum import OPENAI_ERROR_MESSAGE_ENUM
+from .OpenAIModelContextEnum import OPENAI_MODEL_CONTEXT_ENUM
 from .OpenAIModelCostEnum import OPENAI_MODEL_COST_ENUM
 from .OpenAIModelEnum import OpenAIModelEnum
 from .OpenAIVisionModelEnum import OpenAIVisionModelEnum
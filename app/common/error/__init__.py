@@ -4,4 +4,7 @@ from .errors import (
     Unauthorized,
     NotFound,
     NotImplemented,
+    ServiceUnavailable,
+    CircuitOpen,
+    UpstreamError,
 )
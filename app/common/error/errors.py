@@ -24,3 +24,18 @@ class NotImplemented(CommonError):
     """Exception raised for not implemented errors."""
     def __init__(self, message = "Not implemented"):
         super().__init__(message, status_code=501)
+
+class UpstreamError(CommonError):
+    """Exception raised when a dependency answers with an error."""
+    def __init__(self, message = "Upstream error"):
+        super().__init__(message, status_code=502)
+
+class ServiceUnavailable(CommonError):
+    """Exception raised when a dependency is unavailable."""
+    def __init__(self, message = "Service unavailable"):
+        super().__init__(message, status_code=503)
+
+class CircuitOpen(ServiceUnavailable):
+    """Exception raised when a circuit breaker rejects a call without trying it."""
+    def __init__(self, message = "Circuit open"):
+        super().__init__(message)
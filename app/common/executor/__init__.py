@@ -0,0 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Process-wide pool for work that must not block the Streamlit script thread
+background_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="background")
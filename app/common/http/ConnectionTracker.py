@@ -0,0 +1,55 @@
+import threading
+import weakref
+
+import httpx
+
+
+class ConnectionTracker:
+    """Counts new and reused HTTP connections of an httpx client"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.__lock = threading.Lock()
+        self.__seen_streams = weakref.WeakSet()
+        self.__counters = {
+            "requests": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "http2_requests": 0,
+        }
+
+    def on_response(self, response: httpx.Response) -> None:
+        """httpx response event hook"""
+        network_stream = response.extensions.get("network_stream")
+        http_version = response.extensions.get("http_version", b"")
+
+        with self.__lock:
+            self.__counters["requests"] += 1
+
+            if http_version == b"HTTP/2":
+                self.__counters["http2_requests"] += 1
+
+            if network_stream is None:
+                return
+
+            if network_stream in self.__seen_streams:
+                self.__counters["reused_connections"] += 1
+            else:
+                self.__seen_streams.add(network_stream)
+                self.__counters["new_connections"] += 1
+
+    def get_stats(self) -> dict:
+        with self.__lock:
+            stats = dict(self.__counters)
+
+        stats["name"] = self.name
+        stats["reuse_ratio"] = (
+            stats["reused_connections"] / stats["requests"] if stats["requests"] else 0.0
+        )
+
+        return stats
+
+    def reset(self) -> None:
+        with self.__lock:
+            for key in self.__counters:
+                self.__counters[key] = 0
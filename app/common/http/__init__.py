@@ -0,0 +1 @@
+from .ConnectionTracker import ConnectionTracker
@@ -0,0 +1,18 @@
+import copy
+import logging
+import logging.handlers
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves message formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler formats here, in the calling thread
+        record = copy.copy(record)
+
+        if record.exc_info:
+            # Tracebacks hold frames that must not outlive the calling thread
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
@@ -0,0 +1,30 @@
+import json
+import logging
+import re
+
+from .LogPayload import LogPayload
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats records as compact single-line JSON objects"""
+
+    ansi_escape = re.compile(r"\x1b\[[0-9;]*m")
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "thread": record.threadName,
+        }
+
+        if len(record.args or ()) == 1 and isinstance(record.args[0], LogPayload):
+            entry["payload"] = record.args[0].data
+        else:
+            entry["message"] = self.ansi_escape.sub("", record.getMessage())
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry, separators=(",", ":"), ensure_ascii=False, default=str)
@@ -0,0 +1,34 @@
+import json
+
+
+class LogPayload:
+    """Structured log payload serialized lazily, only by the handler that formats it"""
+
+    def __init__(self, data: dict | list, max_field_chars: int = 2000):
+        self.size = 0
+        self.data = self.__truncate(data, max_field_chars)
+
+    def __str__(self) -> str:
+        return json.dumps(self.data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    def __truncate(self, value, max_field_chars: int):
+        """Copy of the payload with long strings cut, counting the approximate size on the way"""
+        if isinstance(value, dict):
+            return {key: self.__truncate(item, max_field_chars) for key, item in value.items()}
+
+        if isinstance(value, (list, tuple)):
+            return [self.__truncate(item, max_field_chars) for item in value]
+
+        if isinstance(value, (str, bytes)):
+            self.size += len(value)
+
+            if isinstance(value, bytes):
+                value = value.decode("utf-8", errors="replace")
+
+            if len(value) > max_field_chars:
+                return f"{value[:max_field_chars]}...(truncated {len(value) - max_field_chars} chars)"
+
+            return value
+
+        self.size += 8
+        return value
@@ -1,10 +1,17 @@
+import atexit
 import colorlog
 import os
-import json
 import logging
+import logging.handlers
+import queue
+import random
 
 from uuid import uuid4
 
+from .DeferredQueueHandler import DeferredQueueHandler
+from .JsonLinesFormatter import JsonLinesFormatter
+from .LogPayload import LogPayload
+
 
 class Logger(logging.Logger):
     """Custom logger class"""
@@ -14,10 +21,34 @@ class Logger(logging.Logger):
     error_file = "logs/error.log"
     name = "app"
     logger = None
-
-    def __init__(self, level=logging.INFO):
+    listener = None
+
+    def __init__(
+        self,
+        level=logging.INFO,
+        async_mode: bool = None,
+        log_format: str = None,
+    ):
+        """
+        Args:
+            level (int): Minimum level logged.
+            async_mode (bool): Hand records to a background listener thread (env LOG_ASYNC, default on).
+            log_format (str): File format, "text" or "jsonl" (env LOG_FORMAT, default text).
+
+        File rotation and payload limits come from the environment:
+        LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATE_WHEN (time rotation, e.g. "midnight"),
+        LOG_MAX_FIELD_CHARS, LOG_LARGE_PAYLOAD_CHARS and LOG_LARGE_PAYLOAD_SAMPLE_RATE.
+        """
         self.logger = logging.getLogger(self.name)
         self.logger.setLevel(level)
+        self.async_mode = (
+            async_mode if async_mode is not None
+            else os.getenv("LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+        )
+        self.log_format = log_format or os.getenv("LOG_FORMAT", "text")
+        self.max_field_chars = int(os.getenv("LOG_MAX_FIELD_CHARS", 2000))
+        self.large_payload_chars = int(os.getenv("LOG_LARGE_PAYLOAD_CHARS", 20000))
+        self.large_payload_sample_rate = float(os.getenv("LOG_LARGE_PAYLOAD_SAMPLE_RATE", 1.0))
         formatter = colorlog.ColoredFormatter(
             fmt="[%(log_color)s%(asctime)s%(reset)s] [%(log_color)s%(levelname)s%(reset)s]: %(message)s",
             log_colors={
@@ -53,9 +84,21 @@ class Logger(logging.Logger):
         self.logger.critical(msg, *args)
 
     def custom_info(self, data: dict | list | str):
-        """Custom info log"""
+        """Custom info log, payloads are truncated and serialized by the handler"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+
         if isinstance(data, dict) or isinstance(data, list):
-            self.info(f"\n{json.dumps(data, indent=4)}")
+            payload = LogPayload(data, self.max_field_chars)
+
+            if (
+                payload.size > self.large_payload_chars
+                and random.random() >= self.large_payload_sample_rate
+            ):
+                self.info(f"[Logger] Sampled out payload of ~{payload.size} chars")
+                return
+
+            self.info("%s", payload)
         elif isinstance(data, str):
             self.info(data)
 
@@ -143,27 +186,64 @@ class Logger(logging.Logger):
         else:
             return response.data.decode("utf-8")
     
+    def stop(self):
+        """Flush and stop the background listener"""
+        if self.listener:
+            self.listener.stop()
+            self.listener = None
+
     def __setup_handlers(self, level: int, formatter: logging.Formatter):
         """Setup handlers"""
         # File handler
         # create file if not exists
         os.makedirs(self.dir, exist_ok=True)
 
+        file_formatter = JsonLinesFormatter() if self.log_format == "jsonl" else formatter
+
         # Info file handler
-        file_handler = logging.FileHandler(self.info_file)
+        file_handler = self.__create_file_handler(self.info_file)
         file_handler.setLevel(level)
-        file_handler.setFormatter(formatter)
+        file_handler.setFormatter(file_formatter)
 
         # Error file handler
-        error_file_handler = logging.FileHandler(self.error_file)
+        error_file_handler = self.__create_file_handler(self.error_file)
         error_file_handler.setLevel(logging.ERROR)
-        error_file_handler.setFormatter(formatter)
+        error_file_handler.setFormatter(file_formatter)
 
         # Console handler
         handler = logging.StreamHandler()
         handler.setLevel(level)
         handler.setFormatter(formatter)
 
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(error_file_handler)
-        self.logger.addHandler(handler)
\ No newline at end of file
+        handlers = [file_handler, error_file_handler, handler]
+
+        if not self.async_mode:
+            for handler in handlers:
+                self.logger.addHandler(handler)
+            return
+
+        # Request threads only enqueue records, the listener thread formats and writes them
+        log_queue = queue.Queue(-1)
+        self.listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        self.logger.addHandler(DeferredQueueHandler(log_queue))
+
+        atexit.register(self.stop)
+
+    def __create_file_handler(self, filename: str) -> logging.Handler:
+        """Size based rotation, or time based when LOG_ROTATE_WHEN is set"""
+        backup_count = int(os.getenv("LOG_BACKUP_COUNT", 5))
+        rotate_when = os.getenv("LOG_ROTATE_WHEN")
+
+        if rotate_when:
+            return logging.handlers.TimedRotatingFileHandler(
+                filename, when=rotate_when, backupCount=backup_count, encoding="utf-8", delay=True,
+            )
+
+        return logging.handlers.RotatingFileHandler(
+            filename,
+            maxBytes=int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
@@ -0,0 +1,124 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+
+
+class LatencyRegistry:
+    """Rolling latency histograms, call and exception counts per function"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.__lock = threading.Lock()
+        self.__functions: dict[str, dict] = {}
+
+    def record(self, name: str, duration: float, exception: Exception = None) -> None:
+        with self.__lock:
+            function = self.__functions.get(name)
+
+            if function is None:
+                function = self.__functions[name] = {
+                    "durations": deque(maxlen=self.window),
+                    "calls": 0,
+                    "errors": 0,
+                    "total_seconds": 0.0,
+                    "exceptions": {},
+                }
+
+            function["durations"].append(duration)
+            function["calls"] += 1
+            function["total_seconds"] += duration
+
+            if exception is not None:
+                exception_name = type(exception).__name__
+                function["errors"] += 1
+                function["exceptions"][exception_name] = function["exceptions"].get(exception_name, 0) + 1
+
+    def snapshot(self) -> dict:
+        """Percentiles in milliseconds over the last `window` calls of each function"""
+        with self.__lock:
+            functions = {
+                name: {**function, "durations": sorted(function["durations"]), "exceptions": dict(function["exceptions"])}
+                for name, function in self.__functions.items()
+            }
+
+        return {
+            "timestamp": time.time(),
+            "window": self.window,
+            "functions": {
+                name: {
+                    "calls": function["calls"],
+                    "errors": function["errors"],
+                    "exceptions": function["exceptions"],
+                    "total_seconds": function["total_seconds"],
+                    "p50_ms": self.__percentile(function["durations"], 50),
+                    "p95_ms": self.__percentile(function["durations"], 95),
+                    "p99_ms": self.__percentile(function["durations"], 99),
+                    "max_ms": function["durations"][-1] * 1000 if function["durations"] else 0.0,
+                }
+                for name, function in functions.items()
+            },
+        }
+
+    def export_json(self, path: str) -> dict:
+        snapshot = self.snapshot()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file, indent=2)
+
+        return snapshot
+
+    def export_prometheus(self, path: str = None) -> str:
+        """Prometheus text exposition format, written to `path` when given"""
+        lines = [
+            "# HELP app_function_latency_seconds Function wall time over the rolling window.",
+            "# TYPE app_function_latency_seconds summary",
+        ]
+        error_lines = [
+            "# HELP app_function_errors_total Function calls that raised.",
+            "# TYPE app_function_errors_total counter",
+        ]
+
+        for name, function in self.snapshot()["functions"].items():
+            label = f'function="{self.__escape(name)}"'
+
+            for quantile in (50, 95, 99):
+                lines.append(
+                    f'app_function_latency_seconds{{{label},quantile="{quantile / 100}"}} {function[f"p{quantile}_ms"] / 1000}'
+                )
+
+            lines.append(f"app_function_latency_seconds_sum{{{label}}} {function['total_seconds']}")
+            lines.append(f"app_function_latency_seconds_count{{{label}}} {function['calls']}")
+            error_lines.append(f"app_function_errors_total{{{label}}} {function['errors']}")
+
+        text = "\n".join(lines + error_lines) + "\n"
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(text)
+
+        return text
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__functions.clear()
+
+    @staticmethod
+    def __percentile(durations: list[float], percentile: int) -> float:
+        """Nearest-rank percentile of sorted durations, in milliseconds"""
+        if not durations:
+            return 0.0
+
+        rank = max(math.ceil(percentile / 100 * len(durations)) - 1, 0)
+        return durations[min(rank, len(durations) - 1)] * 1000
+
+    @staticmethod
+    def __escape(value: str) -> str:
+        return re.sub(r'(["\\])', r"\\\1", value)
@@ -0,0 +1,3 @@
+from .LatencyRegistry import LatencyRegistry
+
+latency_registry = LatencyRegistry()
@@ -0,0 +1,27 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Spaces request starts across threads and pauses everyone after a rate limit response"""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60 / requests_per_minute if requests_per_minute else 0.0
+        self.__lock = threading.Lock()
+        self.__next_slot = time.monotonic()
+        self.__paused_until = 0.0
+
+    def acquire(self) -> None:
+        """Block until the caller may start a request"""
+        with self.__lock:
+            now = time.monotonic()
+            slot = max(self.__next_slot, self.__paused_until, now)
+            self.__next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back, e.g. after a 429 from the provider"""
+        with self.__lock:
+            self.__paused_until = max(self.__paused_until, time.monotonic() + seconds)
@@ -0,0 +1 @@
+from .RateLimiter import RateLimiter
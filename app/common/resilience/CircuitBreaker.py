@@ -0,0 +1,77 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing dependency for a while.
+
+    Opens after `failure_threshold` consecutive failures, lets a single trial call through
+    once `recovery_timeout` seconds have passed and closes again when that call succeeds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.__lock = threading.Lock()
+        self.__state = self.CLOSED
+        self.__failures = 0
+        self.__opened_at = 0.0
+        self.__trial_running = False
+
+    @property
+    def state(self) -> str:
+        with self.__lock:
+            return self.__state
+
+    def allow(self) -> bool:
+        """Whether a call may start now"""
+        with self.__lock:
+            if self.__state == self.CLOSED:
+                return True
+
+            if self.__state == self.OPEN and time.monotonic() - self.__opened_at >= self.recovery_timeout:
+                self.__state = self.HALF_OPEN
+
+            if self.__state == self.HALF_OPEN and not self.__trial_running:
+                self.__trial_running = True
+                return True
+
+            return False
+
+    def record_success(self) -> None:
+        with self.__lock:
+            self.__state = self.CLOSED
+            self.__failures = 0
+            self.__trial_running = False
+
+    def release(self) -> None:
+        """End a call that says nothing about the dependency, e.g. a rejected request, freeing the trial slot"""
+        with self.__lock:
+            self.__trial_running = False
+
+    def record_failure(self) -> None:
+        with self.__lock:
+            self.__failures += 1
+            self.__trial_running = False
+
+            if self.__state == self.HALF_OPEN or self.__failures >= self.failure_threshold:
+                self.__state = self.OPEN
+                self.__opened_at = time.monotonic()
+
+    def get_retry_in(self) -> float:
+        """Seconds until an open circuit lets a trial call through, 0 when calls may start"""
+        with self.__lock:
+            if self.__state != self.OPEN:
+                return 0.0
+
+            return max(self.recovery_timeout - (time.monotonic() - self.__opened_at), 0.0)
+
+    def get_stats(self) -> dict:
+        with self.__lock:
+            return {"name": self.name, "state": self.__state, "failures": self.__failures}
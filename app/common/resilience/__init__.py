@@ -0,0 +1 @@
+from .CircuitBreaker import CircuitBreaker
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 
 class AIChatUserDto(BaseModel):
@@ -12,9 +13,16 @@ class AIChatAgentDto(BaseModel):
     name: str
     model: str
 
+class AIChatTurnDto(BaseModel):
+    message: str
+    response: str
+
 class AIChatDto(BaseModel):
     message: str
     user: AIChatUserDto = None
     agent: AIChatAgentDto = None
     model: str = "gpt-4o-mini"
     stream: bool = False
+    conversation_id: Optional[int] = None
+    history: List[AIChatTurnDto] = []
+    has_older_history: bool = False
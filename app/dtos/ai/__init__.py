@@ -2,4 +2,5 @@ from .AIChatDto import (
     AIChatDto,
     AIChatAgentDto,
     AIChatUserDto,
+    AIChatTurnDto,
 )
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 
 
 class InsertUserChatHistoryDto(BaseModel):
@@ -6,4 +7,4 @@ class InsertUserChatHistoryDto(BaseModel):
     message: str
     response: str
     agent: str = None
-    conversation_id: int = None
+    conversation_id: Optional[int] = None
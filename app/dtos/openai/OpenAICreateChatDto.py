@@ -16,5 +16,6 @@ class OpenAICreateChatDto(BaseModel):
     stream: bool = False
     tools: Optional[List[ChatCompletionToolParam]] = None
     tool_choice: Optional[ChatCompletionToolChoiceOptionParam] = None
+    max_tokens: Optional[int] = None
     user: Optional[str] = None
     extra_body: Optional[dict] = {}
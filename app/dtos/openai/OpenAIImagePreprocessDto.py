@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Literal, Optional, Tuple
+
+
+class OpenAIImagePreprocessDto(BaseModel):
+    """Options of the image preprocessing stage applied before vision requests"""
+    target_long_edge: Optional[int] = 1536
+    crop_box: Optional[Tuple[float, float, float, float]] = None
+    format: Literal["JPEG", "WEBP"] = "JPEG"
+    quality: int = 80
+    detail: Optional[Literal["low", "high", "auto"]] = None
@@ -1,3 +1,4 @@
 from .OpenAIChatServiceResponse import OpenAIChatServiceResponse, ChatResponse
 from .OpenAICreateChatDto import OpenAICreateChatDto
 from .OpenAICreateChatVisionDto import OpenAICreateChatVisionDto
+from .OpenAIImagePreprocessDto import OpenAIImagePreprocessDto
@@ -1,17 +1,21 @@
+import streamlit as st
+
 from app.services.DatabaseService import DatabaseService
+from app.services.LocalLoginService import LocalLoginService
 
 
 class AuthenticationService:
     def __init__(self):
         self.database_service = DatabaseService()
 
-    def authenticate(self, username: str, password: str):
-        user_data = self.database_service.get_user_data(username=username)
-        
-        if (
-            username == user_data.get("username", "")
-            and password == user_data.get("password", "")
-        ):
-            return True
+    def login(self, username: str, password: str) -> dict | None:
+        """
+        Verifies the password and fetches the user in one call.
+
+        Returns:
+            dict: Projected `user` profile and its default `agent`, None when the credentials are wrong.
+        """
+        if st.secrets.get("AUTH_BACKEND", "supabase") == "local":
+            return LocalLoginService.login(username, password)
 
-        return False
+        return self.database_service.login_user(username, password)
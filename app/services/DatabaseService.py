@@ -1,6 +1,5 @@
 import json
-import streamlit as st
-from supabase import create_client, Client
+from supabase import Client
 
 from app.common.error import BadRequest
 from app.common.decorator import func_logger
@@ -10,13 +9,13 @@ from app.dtos.database import (
     UpdateUserDataDto,
 )
 
+from .SupabaseClientService import SupabaseClientService
+from .WriteBehindService import WriteBehindService
+
 
 class DatabaseService:
     def __init__(self):
-        self.supabase: Client = create_client(
-            supabase_url=st.secrets["SUPABASE_URL"],
-            supabase_key=st.secrets["SUPABASE_KEY"]
-        )
+        self.supabase: Client = SupabaseClientService.get_client()
     
     @func_logger
     def get_ai_agents(self) -> list[dict]:
@@ -28,17 +27,18 @@ class DatabaseService:
             logger.error(f"[Database] Error getting AI agents: {e}")
             return []
     
-    def get_user_data(self, username: str) -> dict:
+    @func_logger
+    def login_user(self, username: str, password: str) -> dict | None:
+        """Profile and default agent of a user when the password matches its salted hash, None otherwise"""
         try:
-            response = self.supabase.table("users").select("*").eq("username", username).execute()
+            response = self.supabase.rpc(
+                "login_user", params={"username": username, "password": password},
+            ).execute()
 
-            if response.data:
-                return response.data[0]
-            
-            return {}
+            return response.data or None
         except Exception as e:
-            st.error(f"[Database] Error fetching user data: {e}")
-            return {}
+            logger.error(f"[Database] Error logging in user: {e}")
+            raise BadRequest(f"[Database] Error logging in user: {e}")
     
     def update_user_data(self, data: UpdateUserDataDto) -> None:
         try:
@@ -55,51 +55,67 @@ class DatabaseService:
             logger.error(f"[Database] Error updating user data: {e}")
             raise BadRequest(f"[Database] Error updating user data: {e}")
 
-    def get_chat_history(self, username: str) -> list[dict]:
-        user_id = self.get_user_data(username)["id"]
-        
-        if not user_id:
-            st.error("No user found with that username.")
-            return []
-        
+    def get_chat_history(
+        self, user_id: int, conversation_id: int, limit: int = 20, before_id: int = None, after_id: int = None,
+    ) -> list[dict]:
+        """
+        Turns of a conversation ordered oldest first: the newest `limit` turns older than `before_id`,
+        or the oldest `limit` turns newer than `after_id` when it is given.
+        """
         try:
-            response = (
+            query = (
                 self.supabase
                 .table("user_chat_history")
-                .select("*")
+                .select("id, message, response, agent, conversation_id")
                 .eq("user_id", user_id)
-                .execute()
+                .eq("conversation_id", conversation_id)
             )
+            
+            if before_id:
+                query = query.lt("id", before_id)
+            
+            if after_id is not None:
+                response = query.gt("id", after_id).order("id").limit(limit).execute()
+                
+                return response.data
+            
+            response = query.order("id", desc=True).limit(limit).execute()
 
-            return response.data
+            return list(reversed(response.data))
         except Exception as e:
             logger.error(f"[Database] Error fetching chat history: {e}")
             return []
 
     def insert_chat_history(self, data: InsertUserChatHistoryDto) -> None:
-        try:
-            self.supabase.table("user_chat_history").insert(data.model_dump()).execute()
-            
-            logger.info("[Database] Chat saved successfully!")
-        except Exception as e:
-            logger.error(f"[Database] Error saving chat: {e}")
-            raise BadRequest(f"[Database] Error saving chat: {e}")
+        """Queue the chat for a batched insert, persisted by WriteBehindService"""
+        WriteBehindService.enqueue("user_chat_history", data.model_dump())
+        
+        logger.info("[Database] Chat queued for saving!")
     
     def log_login_activity(self, user_id: int) -> None:
-        try:
-            self.supabase.table("user_activity_logs").insert({"user_id": user_id}).execute()
-            
-            logger.info("[Database] User login activity logged successfully!")
-        except Exception as e:
-            logger.error(f"[Database] Error logging user login activity: {e}")
-            raise BadRequest(f"[Database] Error logging user login activity: {e}")
-    
-    def get_conversation_titles(self, conversation_ids: int | list[int]) -> list[dict]:
-        if isinstance(conversation_ids, int):
-            conversation_ids = [conversation_ids]
+        """Queue the login activity for a batched insert, persisted by WriteBehindService"""
+        WriteBehindService.enqueue("user_activity_logs", {"user_id": user_id})
         
+        logger.info("[Database] User login activity queued for logging!")
+    
+    def get_user_conversations(
+        self, user_id: int, search: str = None, limit: int = 50, before: dict = None,
+    ) -> list[dict]:
+        """
+        Conversations of a user with title, last activity and turn count, most recent first,
+        starting after the `before` conversation row of the previous page.
+        """
         try:
-            response = self.supabase.table("user_chat_titles").select("*").in_("id", conversation_ids).execute()
+            response = self.supabase.rpc(
+                "get_user_conversations",
+                params={
+                    "user_id": user_id,
+                    "search": search or None,
+                    "page_limit": limit,
+                    "before_activity_at": before["last_activity_at"] if before else None,
+                    "before_id": before["id"] if before else None,
+                },
+            ).execute()
             
             return response.data
         except Exception as e:
@@ -117,6 +133,30 @@ class DatabaseService:
             logger.error(f"[Database] Error inserting user chat title: {e}")
             raise BadRequest(f"[Database] Error inserting user chat title: {e}")
     
+    def get_conversation_summary(self, conversation_id: int) -> dict | None:
+        try:
+            response = (
+                self.supabase
+                .table("conversation_summaries")
+                .select("conversation_id, content, through_id, last_turn_digest")
+                .eq("conversation_id", conversation_id)
+                .execute()
+            )
+
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"[Database] Error fetching conversation summary: {e}")
+            raise BadRequest(f"[Database] Error fetching conversation summary: {e}")
+    
+    def upsert_conversation_summary(self, data: dict) -> None:
+        try:
+            self.supabase.table("conversation_summaries").upsert(data, on_conflict="conversation_id").execute()
+            
+            logger.info("[Database] Conversation summary saved!")
+        except Exception as e:
+            logger.error(f"[Database] Error saving conversation summary: {e}")
+            raise BadRequest(f"[Database] Error saving conversation summary: {e}")
+    
     @func_logger
     def get_user_ai_agent(self, user_id: int) -> dict:
         try:
@@ -0,0 +1,78 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import streamlit as st
+
+from app.common.log import logger
+
+
+class LocalLoginService:
+    """
+    Stand-in for the login_user RPC, for tests and local runs without Supabase.
+
+    Users come from the LOCAL_USERS secret, keyed by username:
+        [LOCAL_USERS.ripki]
+        password_hash = "pbkdf2_sha256$600000$<salt>$<hash>"
+        user = { id = 1, username = "ripki", name = "Ripki", language = "en", profile = "", likes = "", dislikes = "" }
+        agent = { agent_id = 1, agent_name = "Ripki AI", model = "gpt-4o-mini" }
+    """
+
+    algorithm = "pbkdf2_sha256"
+    iterations = 600000
+    __dummy_hash: str = None
+
+    @classmethod
+    def login(cls, username: str, password: str) -> dict | None:
+        account = st.secrets.get("LOCAL_USERS", {}).get(username)
+
+        # Hash anyway so unknown usernames take as long as wrong passwords
+        password_hash = account.get("password_hash", "") if account else cls.__get_dummy_hash()
+
+        if not cls.verify_password(password, password_hash) or not account:
+            logger.info("[LocalLogin] Invalid username or password")
+            return None
+
+        return {
+            "user": dict(account.get("user", {})),
+            "agent": dict(account["agent"]) if account.get("agent") else None,
+        }
+
+    @classmethod
+    def hash_password(cls, password: str, salt: bytes = None) -> str:
+        salt = salt or os.urandom(16)
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, cls.iterations)
+
+        return "$".join([
+            cls.algorithm,
+            str(cls.iterations),
+            base64.b64encode(salt).decode(),
+            base64.b64encode(digest).decode(),
+        ])
+
+    @classmethod
+    def verify_password(cls, password: str, password_hash: str) -> bool:
+        try:
+            algorithm, iterations, salt, expected = password_hash.split("$")
+
+            if algorithm != cls.algorithm:
+                return False
+
+            salt = base64.b64decode(salt, validate=True)
+            expected = base64.b64decode(expected, validate=True)
+            iterations = int(iterations)
+        except (ValueError, binascii.Error):
+            # Malformed stored hash, never matches
+            return False
+
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+        return hmac.compare_digest(digest, expected)
+
+    @classmethod
+    def __get_dummy_hash(cls) -> str:
+        if cls.__dummy_hash is None:
+            cls.__dummy_hash = cls.hash_password(base64.b64encode(os.urandom(16)).decode())
+
+        return cls.__dummy_hash
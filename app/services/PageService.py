@@ -1,7 +1,10 @@
 import streamlit as st
-import time
+from concurrent.futures import Future
+from typing import Iterator
 
 from app.common.enums import SidebarEnum
+from app.common.executor import background_executor
+from app.common.log import logger
 from app.dtos.database import (
     InsertUserChatHistoryDto,
     UpdateUserDataDto,
@@ -10,9 +13,10 @@ from app.dtos.ai import (
     AIChatDto, 
     AIChatAgentDto, 
     AIChatUserDto,
+    AIChatTurnDto,
 )
 from app.services import DatabaseService
-from app.services.ai import AIService
+from app.services.ai import AIService, AIAgentCatalogService
 
 from .AuthenticationService import AuthenticationService
 
@@ -29,6 +33,9 @@ class PageService:
             st.session_state.messages = []
             st.session_state.conversation_title = ""
             st.session_state.conversation_id = ""
+            st.session_state.history_cursor = None
+            st.session_state.history_has_more = False
+            st.session_state.render_window = 0
         
         # Set session page
         st.session_state.page_name = page_name
@@ -49,21 +56,24 @@ class PageService:
         
             if login_button:
                 if username and password:
-                    # Authenticate username and password
-                    if self.authentication_service.authenticate(username, password):
+                    # Authenticate and fetch the user with its default agent in one call
+                    login = self.authentication_service.login(username, password)
+                    
+                    if login:
                         # Set session state logged in
                         st.session_state.logged_in = True
-
-                        # Set session user id
-                        user_data = self.database_service.get_user_data(username)
-                        st.session_state.user_data = user_data
+                        st.session_state.user_data = login["user"]
+                        
+                        if login.get("agent"):
+                            st.session_state.agent = {
+                                "id": login["agent"]["agent_id"],
+                                "name": login["agent"]["agent_name"],
+                                "model": login["agent"]["model"],
+                            }
                         
-                        # Log login activity
-                        self.database_service.log_login_activity(user_data["id"])
+                        # Log login activity, written in the background
+                        self.database_service.log_login_activity(login["user"]["id"])
 
-                        # Add description and rerun streamlit
-                        st.success("Logged in successfully!")
-                        time.sleep(0.5)
                         st.rerun()
                     
                     st.error("Outsiders not allowed!")
@@ -91,35 +101,49 @@ class PageService:
         def popover_character():
             with st.popover(st.session_state.agent['name']):
                 # Streamlit dropdown option for ai agents
-                ai_agents = self.database_service.get_ai_agents()
-                ai_agents.reverse()
+                ai_agents = AIAgentCatalogService.get_agents()
                                 
                 selected_agent = st.radio(
                     label="Choose Character",
                     options=[character["name"] for character in ai_agents],
                     captions=[character["description"] for character in ai_agents],
-                    index=st.session_state.agent["id"] - 1,
+                    index=AIAgentCatalogService.get_position(st.session_state.agent["id"]),
                     label_visibility="collapsed",
                 )
                 
-                # Change popover label
+                # Change popover label, keep the current agent when the selection left the catalog
                 if selected_agent != st.session_state.agent["name"]:
-                    st.session_state.agent = next(agent for agent in ai_agents if agent["name"] == selected_agent)
-                    st.rerun(scope="fragment")
+                    if agent := AIAgentCatalogService.get_by_name(selected_agent):
+                        st.session_state.agent = agent
+                        st.rerun(scope="fragment")
         
         popover_character()
         
         # Set conversation title if exists
+        title_placeholder = st.empty()
+        
         if st.session_state.conversation_title:
-            st.subheader(st.session_state.conversation_title, divider=True)
+            title_placeholder.subheader(st.session_state.conversation_title, divider=True)
+        
+        # Only render the last turns, older turns stay behind the load earlier control
+        window_size = st.secrets.get("CHAT_RENDER_WINDOW", 10)
+        render_window = st.session_state.render_window or window_size
+        visible_messages = st.session_state.messages[-render_window * 2:]
+        hidden_count = len(st.session_state.messages) - len(visible_messages)
+        
+        if hidden_count or st.session_state.history_has_more:
+            if st.button("Load earlier messages", key="load_earlier_messages"):
+                # Fetch older turns of a chat history once every loaded turn is shown
+                if not hidden_count:
+                    st.session_state.messages = self.__load_chat_history() + st.session_state.messages
+                
+                st.session_state.render_window = render_window + window_size
+                st.rerun()
         
         # Show streamlit built-in message container
-        for message in st.session_state.messages:
+        for message in visible_messages:
             with st.chat_message(message["role"]):
-                if message.get("agent"):
-                    st.markdown(f':orange[**{message["agent"]}**]')
-                
-                st.markdown(message["content"])
+                st.markdown(self.__render_message(message["content"], message.get("agent")))
 
         # Valid for new chat or chat history is chosen
         if st.session_state.messages or st.session_state.page_name == "Ripki AI":
@@ -129,14 +153,13 @@ class PageService:
                 with st.chat_message("user"):
                     st.markdown(new_message)
                 
-                # Fetch additional user data from db                
-                # Set conversation title and id for new chat
+                # Set conversation title and id for new chat in the background while the answer streams
+                conversation_future = None
+                
                 if not st.session_state.conversation_id:
-                    conversation_title = self.ai_service.define_conversation_title(new_message)
-                    st.session_state.conversation_title = conversation_title
-                    
-                    conversation_data = self.database_service.insert_conversation_title(conversation_title, st.session_state.user_data["id"])
-                    st.session_state.conversation_id = conversation_data["id"]
+                    conversation_future = background_executor.submit(
+                        self.__create_conversation, new_message, st.session_state.user_data["id"],
+                    )
                 
                 # Get AI response
                 stream = self.ai_service.chat(
@@ -155,12 +178,17 @@ class PageService:
                         agent=AIChatAgentDto(**st.session_state.agent),
                         model=st.session_state.agent["model"],
                         stream=True,
+                        conversation_id=st.session_state.conversation_id or None,
+                        history=self.__get_turns(st.session_state.messages[:-1]),
+                        has_older_history=st.session_state.history_has_more,
                     )
                 )
 
                 with st.chat_message("assistant"):
                     st.markdown(f':orange[**{st.session_state.agent["name"]}**]')
-                    response = st.write_stream(stream)
+                    response = st.write_stream(
+                        self.__stream_with_title(stream, conversation_future, title_placeholder)
+                    )
                 
                 # Log chat history
                 self.database_service.insert_chat_history(
@@ -169,7 +197,7 @@ class PageService:
                         message=new_message,
                         response=response,
                         agent=st.session_state.agent["name"],
-                        conversation_id=st.session_state.conversation_id,
+                        conversation_id=st.session_state.conversation_id or None,
                     )
                 )
                 
@@ -179,37 +207,61 @@ class PageService:
         self.chat_page()
     
     def chat_history_page(self):
-        # Get chat history
-        chat_history = self.database_service.get_chat_history(st.session_state.user_data["username"])
-        chat_history = [chat for chat in chat_history if chat["conversation_id"]]
+        page_size = st.secrets.get("CONVERSATION_PAGE_SIZE", 50)
         
-        # Set conversation ids
-        conversation_ids = set([chat["conversation_id"] for chat in chat_history if chat["conversation_id"]])
+        search = st.text_input("Search chat history", placeholder="Filter by title")
         
-        # Fetch conversation titles
-        conversations = self.database_service.get_conversation_titles(list(conversation_ids))
-        conversation_titles = [conversation["title"] for conversation in conversations]
+        # Back to the first page when the filter changes
+        if search != st.session_state.conversation_search:
+            st.session_state.conversation_search = search
+            st.session_state.conversation_cursors = []
+        
+        # Fetch the page after the last row of the previous one, plus one to know whether a next page exists
+        cursors = st.session_state.conversation_cursors
+        conversations = self.database_service.get_user_conversations(
+            user_id=st.session_state.user_data["id"],
+            search=search,
+            limit=page_size + 1,
+            before=cursors[-1] if cursors else None,
+        )
+        has_next_page = len(conversations) > page_size
+        conversations = conversations[:page_size]
         
         # Streamlit dropdown option for conversation history 
-        selected_history = st.selectbox(label="Select chat history", options=conversation_titles)
+        selected_history = st.selectbox(
+            label="Select chat history",
+            options=conversations,
+            format_func=lambda conversation: (
+                f"{conversation['title']} · {conversation['turn_count']} turns"
+                f" · {str(conversation['last_activity_at'])[:16].replace('T', ' ')}"
+            ),
+        )
+        
+        previous_column, next_column = st.columns(2)
+        
+        if cursors and previous_column.button("Newer", key="conversation_newer"):
+            cursors.pop()
+            st.rerun()
+        
+        if has_next_page and next_column.button("Older", key="conversation_older"):
+            cursors.append(conversations[-1])
+            st.rerun()
         
         # Applied when button is clicked
-        if st.button('Get chat history', key='chat_history'):
-            st.session_state.conversation_id = [
-                conversation["id"] 
-                for conversation in conversations
-                if conversation["title"] == selected_history
-            ][0]
-            
-            # Get chat history if conversation title is selected or changed
+        if selected_history and st.button('Get chat history', key='chat_history'):
+            # Get chat history if conversation is selected or changed
             if (
-                selected_history != st.session_state.conversation_title
-                or not st.session_state.conversation_title
+                selected_history["id"] != st.session_state.conversation_id
+                or not st.session_state.messages
             ):
-                # Process chat history
-                st.session_state.messages = self.__process_chat_history(chat_history)
+                st.session_state.conversation_id = selected_history["id"]
+                
+                # Load the newest page of the conversation
+                st.session_state.history_cursor = None
+                st.session_state.render_window = 0
+                st.session_state.messages = self.__load_chat_history()
             
-            st.session_state.conversation_title = selected_history
+            st.session_state.conversation_title = selected_history["title"]
             
         self.chat_page()
     
@@ -239,12 +291,77 @@ class PageService:
             
                 st.toast("Profile updated successfully!", icon="✅️")
         
-    def __process_chat_history(self, chat_history: list[dict]):
-        # Filter chat history by conversation id
-        chat_history = [
-            chat for chat in chat_history
-            if chat["conversation_id"] == st.session_state.conversation_id
-        ]
+    def __create_conversation(self, message: str, user_id: int) -> dict:
+        """Title a new conversation and insert it, runs outside the script thread"""
+        conversation_title = self.ai_service.define_conversation_title(message)
+        
+        return self.database_service.insert_conversation_title(conversation_title, user_id)
+    
+    def __stream_with_title(self, stream: Iterator, conversation_future: Future, title_placeholder) -> Iterator:
+        """Pass the stream through and show the conversation title as soon as it is ready"""
+        for chunk in stream:
+            if conversation_future and conversation_future.done():
+                self.__set_conversation(conversation_future, title_placeholder)
+                # Read the result once so a failure is logged once
+                conversation_future = None
+            
+            yield chunk
+        
+        # Title not ready before the answer ended, wait for it
+        if conversation_future:
+            self.__set_conversation(conversation_future, title_placeholder)
+    
+    def __set_conversation(self, conversation_future: Future, title_placeholder) -> None:
+        if st.session_state.conversation_id:
+            return
+        
+        try:
+            conversation_data = conversation_future.result()
+        except Exception as e:
+            # Keep the answer, the chat is saved without a conversation and titling retries next message
+            logger.error(f"[Page] Error creating conversation: {e}")
+            return
+        
+        st.session_state.conversation_title = conversation_data["title"]
+        st.session_state.conversation_id = conversation_data["id"]
+        title_placeholder.subheader(st.session_state.conversation_title, divider=True)
+    
+    @staticmethod
+    def __render_message(content: str, agent: str = None) -> str:
+        """Markdown of a chat message"""
+        if agent:
+            return f":orange[**{agent}**]\n\n{content}"
+        
+        return content
+    
+    @staticmethod
+    def __get_turns(messages: list[dict]) -> list[AIChatTurnDto]:
+        """Pair the session messages into turns for the conversation memory"""
+        turns = []
+        
+        for message, response in zip(messages, messages[1:]):
+            if message["role"] == "user" and response["role"] == "assistant":
+                turns.append(AIChatTurnDto(message=message["content"], response=response["content"]))
+        
+        return turns
+    
+    def __load_chat_history(self) -> list[dict]:
+        """Fetch the page of turns before the session cursor and move the cursor back"""
+        page_size = st.secrets.get("CHAT_HISTORY_PAGE_SIZE", 20)
+        
+        # Fetch one extra turn to know whether older turns exist
+        chat_history = self.database_service.get_chat_history(
+            user_id=st.session_state.user_data["id"],
+            conversation_id=st.session_state.conversation_id,
+            limit=page_size + 1,
+            before_id=st.session_state.history_cursor,
+        )
+        
+        st.session_state.history_has_more = len(chat_history) > page_size
+        chat_history = chat_history[-page_size:]
+        
+        if chat_history:
+            st.session_state.history_cursor = chat_history[0]["id"]
         
         messages = []
         
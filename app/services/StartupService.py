@@ -0,0 +1,109 @@
+import threading
+import time
+import streamlit as st
+from concurrent.futures import Future
+
+from app.common.executor import background_executor
+from app.common.log import logger
+from app.common.metrics import latency_registry
+
+from .PageService import PageService
+from .RollbarService import RollbarService
+
+
+class StartupService:
+    """
+    Builds the service graph once per process and measures the overhead of each rerun.
+
+    Streamlit runs no app code before the first session connects, so `start` is called first thing
+    in the script and builds the services on a background thread while the rerun sets up its session.
+    """
+
+    __lock = threading.Lock()
+    __page_service: Future = None
+
+    @classmethod
+    def start(cls) -> None:
+        """Start building the services and warming up, once per process"""
+        with cls.__lock:
+            if cls.__page_service is not None:
+                return
+
+            cls.__page_service = Future()
+
+        threading.Thread(target=cls.__build, name="startup", daemon=True).start()
+
+    @classmethod
+    def get_page_service(cls) -> PageService:
+        """Page service of the process, waiting for the startup thread when it is still building"""
+        cls.start()
+
+        return cls.__page_service.result()
+
+    @classmethod
+    def warm_up(cls) -> None:
+        """Load process-wide clients, catalogs and models in the background before the first message needs them"""
+        from app.services.ai import AIAgentCatalogService, MessageClassifierService
+        from app.services.openai import OpenAIClientService, OpenAITokenizerService
+        
+        tasks = {
+            "agent catalog": AIAgentCatalogService.get_agents,
+            "openai client": OpenAIClientService.get_client,
+            "tokenizer": lambda: OpenAITokenizerService.get_encoding("gpt-4o-mini"),
+            "message classifier": lambda: MessageClassifierService.predict(""),
+        }
+        
+        for name, task in tasks.items():
+            background_executor.submit(cls.__run_warm_up, name, task)
+
+    @staticmethod
+    def record_rerun(name: str, start: float) -> None:
+        """
+        Record the time since `start` of a rerun phase.
+
+        The `overhead` phase, everything before a page renders, is checked against
+        the RERUN_OVERHEAD_BUDGET_MS secret.
+        """
+        duration = time.perf_counter() - start
+        latency_registry.record(f"Streamlit.rerun_{name}", duration)
+        
+        budget = st.secrets.get("RERUN_OVERHEAD_BUDGET_MS", 50)
+        
+        if name == "overhead" and duration * 1000 > budget:
+            logger.warning(f"[Streamlit] Rerun overhead {duration * 1000:.1f} ms is over the {budget} ms budget")
+
+    @classmethod
+    def __build(cls) -> None:
+        logger.info("[Streamlit] Starting app...")
+        start = time.perf_counter()
+        
+        try:
+            RollbarService.initialize()
+            page_service = PageService()
+            cls.warm_up()
+        except Exception as e:
+            logger.error(f"[Streamlit] Error starting app: {e}")
+            
+            # Let the next rerun try again instead of failing every session of the process
+            with cls.__lock:
+                future, cls.__page_service = cls.__page_service, None
+            
+            future.set_exception(e)
+            return
+        
+        latency_registry.record("Streamlit.startup", time.perf_counter() - start)
+        logger.info(f"[Streamlit] App initialized in {(time.perf_counter() - start) * 1000:.0f} ms!")
+        
+        cls.__page_service.set_result(page_service)
+
+    @staticmethod
+    def __run_warm_up(name: str, task) -> None:
+        start = time.perf_counter()
+        
+        try:
+            task()
+        except Exception as e:
+            logger.error(f"[Streamlit] Error warming up {name}: {e}")
+            return
+        
+        logger.info(f"[Streamlit] Warmed up {name} in {(time.perf_counter() - start) * 1000:.0f} ms")
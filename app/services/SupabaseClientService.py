@@ -0,0 +1,91 @@
+import httpx
+import threading
+import streamlit as st
+from postgrest.utils import SyncClient
+from supabase import create_client, Client
+
+from app.common.http import ConnectionTracker
+from app.common.log import logger
+
+
+class SupabaseClientService:
+    """Process-wide Supabase client sharing a single pooled HTTP session"""
+
+    __lock = threading.Lock()
+    __client: Client = None
+    __session: SyncClient = None
+    __tracker = ConnectionTracker("supabase")
+    __borrows = 0
+
+    @classmethod
+    def get_client(cls) -> Client:
+        with cls.__lock:
+            if cls.__client is None:
+                cls.__client = cls.__create_client()
+
+            cls.__borrows += 1
+
+            # Supabase drops its PostgREST client on auth events, re-attach the pooled session
+            if cls.__client.postgrest.session is not cls.__session:
+                cls.__install_session(cls.__client)
+
+            return cls.__client
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        stats = cls.__tracker.get_stats()
+        stats["client_borrows"] = cls.__borrows
+        stats["client_reuses"] = max(cls.__borrows - 1, 0)
+
+        return stats
+
+    @classmethod
+    def close(cls) -> None:
+        with cls.__lock:
+            if cls.__session is not None:
+                cls.__session.close()
+
+            cls.__client = None
+            cls.__session = None
+
+    @classmethod
+    def __create_client(cls) -> Client:
+        logger.info("[Database] Creating shared Supabase client...")
+
+        client = create_client(
+            supabase_url=st.secrets["SUPABASE_URL"],
+            supabase_key=st.secrets["SUPABASE_KEY"]
+        )
+        cls.__install_session(client)
+
+        return client
+
+    @classmethod
+    def __install_session(cls, client: Client) -> None:
+        postgrest = client.postgrest
+        default_session = postgrest.session
+
+        if cls.__session is None:
+            cls.__session = SyncClient(
+                base_url=default_session.base_url,
+                headers=default_session.headers,
+                timeout=httpx.Timeout(
+                    st.secrets.get("SUPABASE_READ_TIMEOUT", 30),
+                    connect=st.secrets.get("SUPABASE_CONNECT_TIMEOUT", 5),
+                ),
+                limits=httpx.Limits(
+                    max_connections=st.secrets.get("SUPABASE_POOL_MAX_CONNECTIONS", 20),
+                    max_keepalive_connections=st.secrets.get("SUPABASE_POOL_MAX_KEEPALIVE", 10),
+                    keepalive_expiry=st.secrets.get("SUPABASE_POOL_KEEPALIVE_EXPIRY", 60),
+                ),
+                http2=st.secrets.get("SUPABASE_HTTP2", True),
+                follow_redirects=True,
+                event_hooks={"response": [cls.__tracker.on_response]},
+            )
+        else:
+            cls.__session.headers.update(default_session.headers)
+
+        if default_session is not cls.__session:
+            default_session.close()
+
+        postgrest.session = cls.__session
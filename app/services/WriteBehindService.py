@@ -0,0 +1,266 @@
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+import streamlit as st
+from collections import defaultdict
+from postgrest.exceptions import APIError
+
+from app.common.log import logger
+
+from .SupabaseClientService import SupabaseClientService
+
+
+class WriteBehindService:
+    """
+    Bounded in-process queue that batches inserts into Supabase off the script thread.
+
+    Rows that fail with a transient error are spilled to disk and replayed periodically, rows
+    Supabase rejects are moved to a quarantine file instead of being retried.
+    """
+
+    __lock = threading.Lock()
+    __spill_lock = threading.Lock()
+    __queue: queue.Queue = None
+    __worker: threading.Thread = None
+    __stopping = threading.Event()
+    __config: dict = {}
+    __shutdown_hooks: list = []
+    __stats = {
+        "enqueued": 0,
+        "written": 0,
+        "batches": 0,
+        "retries": 0,
+        "spilled": 0,
+        "replayed": 0,
+        "quarantined": 0,
+    }
+
+    @classmethod
+    def enqueue(cls, table: str, row: dict) -> None:
+        cls.__ensure_started()
+
+        try:
+            cls.__queue.put_nowait((table, row))
+            cls.__count("enqueued")
+        except queue.Full:
+            logger.warning(f"[WriteBehind] Queue full, spilling {table} row to disk")
+            cls.__spill([(table, row)])
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        with cls.__lock:
+            stats = dict(cls.__stats)
+
+        stats["pending"] = cls.__queue.qsize() if cls.__queue else 0
+
+        return stats
+
+    @classmethod
+    def add_shutdown_hook(cls, hook) -> None:
+        """Run `hook` at shutdown before the queue is drained, e.g. to enqueue buffered rows"""
+        cls.__shutdown_hooks.append(hook)
+
+    @classmethod
+    def shutdown(cls, timeout: float = 10.0) -> None:
+        """Flush pending rows, spill what could not be written in time"""
+        for hook in cls.__shutdown_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"[WriteBehind] Error running shutdown hook: {e}")
+
+        if cls.__worker is None:
+            return
+
+        cls.__stopping.set()
+        cls.__worker.join(timeout)
+
+        pending = []
+
+        while True:
+            try:
+                pending.append(cls.__queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if pending:
+            cls.__spill(pending)
+
+        logger.info(f"[WriteBehind] Shutdown complete: {cls.get_stats()}")
+
+    @classmethod
+    def __ensure_started(cls) -> None:
+        if cls.__worker is not None:
+            return
+
+        with cls.__lock:
+            if cls.__worker is not None:
+                return
+
+            cls.__config = {
+                "max_queue": st.secrets.get("WRITE_BEHIND_MAX_QUEUE", 1000),
+                "batch_size": st.secrets.get("WRITE_BEHIND_BATCH_SIZE", 50),
+                "flush_interval": st.secrets.get("WRITE_BEHIND_FLUSH_INTERVAL", 1.0),
+                "max_retries": st.secrets.get("WRITE_BEHIND_MAX_RETRIES", 3),
+                "spill_file": st.secrets.get("WRITE_BEHIND_SPILL_FILE", "data/write_behind.jsonl"),
+                "replay_interval": st.secrets.get("WRITE_BEHIND_REPLAY_INTERVAL", 60.0),
+                "quarantine_file": st.secrets.get("WRITE_BEHIND_QUARANTINE_FILE", "data/write_behind_quarantine.jsonl"),
+            }
+            cls.__queue = queue.Queue(maxsize=cls.__config["max_queue"])
+            cls.__worker = threading.Thread(target=cls.__run, name="write-behind", daemon=True)
+            cls.__worker.start()
+
+    @classmethod
+    def __run(cls) -> None:
+        next_replay = 0.0
+
+        while True:
+            # Rows spilled by a previous run or a failed batch are retried once the backend recovers
+            if time.monotonic() >= next_replay and not cls.__stopping.is_set():
+                cls.__replay_spill()
+                next_replay = time.monotonic() + cls.__config["replay_interval"]
+
+            batch = cls.__collect_batch()
+
+            if batch:
+                cls.__write(batch)
+            elif cls.__stopping.is_set():
+                return
+
+    @classmethod
+    def __collect_batch(cls) -> list[tuple[str, dict]]:
+        batch = []
+        deadline = time.monotonic() + cls.__config["flush_interval"]
+
+        while len(batch) < cls.__config["batch_size"]:
+            timeout = deadline - time.monotonic()
+
+            if timeout <= 0:
+                break
+
+            try:
+                batch.append(cls.__queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        return batch
+
+    @classmethod
+    def __write(cls, batch: list[tuple[str, dict]]) -> None:
+        # Bulk insert needs the same columns on every row
+        groups = defaultdict(list)
+
+        for table, row in batch:
+            groups[(table, tuple(sorted(row)))].append(row)
+
+        for (table, _), rows in groups.items():
+            error = cls.__insert_with_retry(table, rows)
+
+            if error is None:
+                cls.__count("written", len(rows))
+                cls.__count("batches")
+            elif cls.__is_retryable(error):
+                cls.__spill([(table, row) for row in rows])
+            elif len(rows) > 1:
+                # One rejected row fails the whole bulk insert, write the rows one by one to find it
+                for row in rows:
+                    cls.__write([(table, row)])
+            else:
+                cls.__quarantine(table, rows[0], error)
+
+    @classmethod
+    def __insert_with_retry(cls, table: str, rows: list[dict]) -> Exception | None:
+        """Insert `rows`, returning the last error when they could not be written"""
+        for attempt in range(cls.__config["max_retries"] + 1):
+            try:
+                SupabaseClientService.get_client().table(table).insert(rows).execute()
+                return None
+            except Exception as e:
+                logger.error(f"[WriteBehind] Error inserting {len(rows)} rows into {table} (attempt {attempt + 1}): {e}")
+                error = e
+
+            if not cls.__is_retryable(error):
+                return error
+
+            if attempt < cls.__config["max_retries"]:
+                cls.__count("retries")
+                time.sleep(min(0.5 * 2 ** attempt, 10) * random.uniform(0.5, 1.5))
+
+        return error
+
+    @staticmethod
+    def __is_retryable(error: Exception) -> bool:
+        """Rows Supabase answers with a 4xx fail the same way on every retry"""
+        if not isinstance(error, APIError):
+            return True
+
+        code = str(error.code or "")
+
+        # HTTP status of a response without a JSON body
+        if code.isdigit() and len(code) == 3:
+            return not 400 <= int(code) < 500
+
+        # Data, integrity and schema errors of Postgres, request errors of PostgREST
+        return not code.startswith(("22", "23", "42", "PGRST1", "PGRST2"))
+
+    @classmethod
+    def __quarantine(cls, table: str, row: dict, error: Exception) -> None:
+        quarantine_file = cls.__config["quarantine_file"]
+
+        logger.error(f"[WriteBehind] {table} row rejected, moving it to {quarantine_file}: {error}")
+
+        with cls.__spill_lock:
+            os.makedirs(os.path.dirname(quarantine_file) or ".", exist_ok=True)
+
+            with open(quarantine_file, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"table": table, "row": row, "error": str(error)}, default=str) + "\n")
+
+        cls.__count("quarantined")
+
+    @classmethod
+    def __spill(cls, items: list[tuple[str, dict]]) -> None:
+        spill_file = cls.__config.get("spill_file", "data/write_behind.jsonl")
+
+        with cls.__spill_lock:
+            os.makedirs(os.path.dirname(spill_file) or ".", exist_ok=True)
+
+            with open(spill_file, "a", encoding="utf-8") as file:
+                for table, row in items:
+                    file.write(json.dumps({"table": table, "row": row}, default=str) + "\n")
+
+        cls.__count("spilled", len(items))
+
+    @classmethod
+    def __replay_spill(cls) -> None:
+        """Write rows spilled by a previous run or a failed batch"""
+        spill_file = cls.__config["spill_file"]
+
+        with cls.__spill_lock:
+            if not os.path.exists(spill_file):
+                return
+
+            with open(spill_file, encoding="utf-8") as file:
+                items = [json.loads(line) for line in file if line.strip()]
+
+            os.remove(spill_file)
+
+        if items:
+            logger.info(f"[WriteBehind] Replaying {len(items)} spilled rows")
+            cls.__count("replayed", len(items))
+
+            batch_size = cls.__config["batch_size"]
+
+            for start in range(0, len(items), batch_size):
+                cls.__write([(item["table"], item["row"]) for item in items[start:start + batch_size]])
+
+    @classmethod
+    def __count(cls, key: str, value: int = 1) -> None:
+        with cls.__lock:
+            cls.__stats[key] += value
+
+
+atexit.register(WriteBehindService.shutdown)
@@ -1,4 +1,8 @@
+from .SupabaseClientService import SupabaseClientService
+from .WriteBehindService import WriteBehindService
+from .LocalLoginService import LocalLoginService
 from .AuthenticationService import AuthenticationService
 from .DatabaseService import DatabaseService
 from .PageService import PageService
 from .RollbarService import RollbarService
+from .StartupService import StartupService
@@ -0,0 +1,94 @@
+import threading
+import time
+import streamlit as st
+
+from app.common.log import logger
+from app.services import DatabaseService
+
+
+class AIAgentCatalogService:
+    """Process-wide cache of the ai_agents table, indexed by id and name"""
+
+    __lock = threading.Lock()
+    __agents: list[dict] = []
+    __by_id: dict[int, dict] = {}
+    __by_name: dict[str, dict] = {}
+    __positions: dict[int, int] = {}
+    __loaded_at: float = 0.0
+    __version: int = 0
+
+    @classmethod
+    def get_agents(cls) -> list[dict]:
+        """Agents in display order (newest first), copied so callers can not change the shared catalog"""
+        cls.__ensure_loaded()
+        return [dict(agent) for agent in cls.__agents]
+
+    @classmethod
+    def get_by_id(cls, agent_id: int) -> dict:
+        cls.__ensure_loaded()
+        agent = cls.__by_id.get(agent_id)
+
+        return dict(agent) if agent else {}
+
+    @classmethod
+    def get_by_name(cls, name: str) -> dict | None:
+        """Agent with the given name, None when it is not in the catalog"""
+        cls.__ensure_loaded()
+        agent = cls.__by_name.get(name)
+
+        return dict(agent) if agent else None
+
+    @classmethod
+    def get_position(cls, agent_id: int) -> int:
+        """Position of the agent in display order, 0 when unknown"""
+        cls.__ensure_loaded()
+        return cls.__positions.get(agent_id, 0)
+
+    @classmethod
+    def get_version(cls) -> int:
+        """Increases every time the catalog is reloaded with new data"""
+        cls.__ensure_loaded()
+        return cls.__version
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Force a reload on next access, call after editing ai_agents"""
+        with cls.__lock:
+            cls.__loaded_at = 0.0
+
+        logger.info("[AIAgentCatalog] Catalog invalidated")
+
+    @classmethod
+    def __is_fresh(cls) -> bool:
+        ttl = st.secrets.get("AI_AGENT_CATALOG_TTL", 300)
+        return bool(cls.__loaded_at) and time.monotonic() - cls.__loaded_at < ttl
+
+    @classmethod
+    def __ensure_loaded(cls) -> None:
+        if cls.__is_fresh():
+            return
+
+        with cls.__lock:
+            # Another session may have reloaded while waiting for the lock
+            if cls.__is_fresh():
+                return
+
+            agents = DatabaseService().get_ai_agents()
+
+            if not agents and cls.__agents:
+                logger.warning("[AIAgentCatalog] Reload returned no agents, keeping cached catalog")
+                cls.__loaded_at = time.monotonic()
+                return
+
+            agents = sorted(agents, key=lambda agent: agent["id"], reverse=True)
+
+            if agents != cls.__agents:
+                cls.__version += 1
+
+            cls.__agents = agents
+            cls.__by_id = {agent["id"]: agent for agent in agents}
+            cls.__by_name = {agent["name"]: agent for agent in agents}
+            cls.__positions = {agent["id"]: position for position, agent in enumerate(agents)}
+            cls.__loaded_at = time.monotonic() if agents else 0.0
+
+            logger.info(f"[AIAgentCatalog] Loaded {len(agents)} agents (version {cls.__version})")
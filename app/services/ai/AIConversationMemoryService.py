@@ -0,0 +1,259 @@
+import hashlib
+import threading
+import streamlit as st
+from cachetools import LRUCache
+from datetime import datetime, timezone
+from openai.types.chat import (
+    ChatCompletionAssistantMessageParam,
+    ChatCompletionMessageParam,
+    ChatCompletionSystemMessageParam,
+    ChatCompletionUserMessageParam,
+)
+from typing import List
+
+from app.common.executor import background_executor
+from app.common.log import logger
+from app.dtos.ai import AIChatTurnDto
+from app.dtos.openai import OpenAICreateChatDto
+from app.services import DatabaseService
+from app.services.openai import OpenAIChatService, OpenAICostLedgerService, OpenAITokenizerService
+
+
+class AIConversationMemoryService:
+    """
+    Recent turns of a conversation within a token budget, older turns folded into a running summary.
+
+    The recent turns are the ones the page already holds, so building the prompt needs no database
+    call. The summary lives in conversation_summaries and is cached per process; loading it and
+    folding the turns that left the window run in the background, so the current message uses
+    the summary known so far and never waits for summarization.
+    Configured with the AI_MEMORY_TOKEN_BUDGET, AI_MEMORY_SUMMARY_BATCH, AI_MEMORY_SUMMARY_MODEL,
+    AI_MEMORY_SUMMARY_MAX_TOKENS and AI_MEMORY_SUMMARY_CACHE_SIZE secrets.
+    """
+
+    __lock = threading.Lock()
+    __summaries: LRUCache = None
+    __updating: set = set()
+    __chat_service: OpenAIChatService = None
+
+    @classmethod
+    def get_memory(
+        cls,
+        user_id: int,
+        conversation_id: int,
+        history: List[AIChatTurnDto],
+        has_older_history: bool = False,
+        model: str = "gpt-4o-mini",
+    ) -> List[ChatCompletionMessageParam]:
+        """
+        Args:
+            user_id (int): Owner of the conversation.
+            conversation_id (int): Conversation of the new message.
+            history (list of AIChatTurnDto): Turns held by the page, oldest first.
+            has_older_history (bool): Whether the conversation has turns older than `history`.
+            model (str): Model the tokens are counted for.
+        """
+        if not conversation_id:
+            return []
+
+        summary = cls.get_summary(conversation_id)
+        covered_digest = summary["last_turn_digest"] if summary else None
+        budget = st.secrets.get("AI_MEMORY_TOKEN_BUDGET", 2000)
+
+        if summary and summary["content"]:
+            budget -= cls.count_tokens(summary["content"], model)
+
+        # Newest turns first until the budget runs out or the summary already covers the turn
+        window = []
+        reached_summary = False
+
+        for turn in reversed(history):
+            if covered_digest and cls.digest(turn) == covered_digest:
+                reached_summary = True
+                break
+
+            tokens = cls.count_tokens(turn.message, model) + cls.count_tokens(turn.response, model)
+
+            if tokens > budget:
+                break
+
+            budget -= tokens
+            window.insert(0, turn)
+
+        has_unsummarized = not reached_summary and (len(window) < len(history) or has_older_history)
+
+        # Unknown summary is loaded in the background, turns outside the window are folded into it
+        if summary is None or has_unsummarized:
+            cls.__schedule_update(user_id, conversation_id, window[0] if window else None)
+
+        messages = []
+
+        if summary and summary["content"]:
+            messages.append(
+                ChatCompletionSystemMessageParam(
+                    role="system",
+                    content=f"Summary of the earlier conversation:\n{summary['content']}",
+                    name="conversation-summary",
+                )
+            )
+
+        for turn in window:
+            messages.append(
+                ChatCompletionUserMessageParam(role="user", content=turn.message, name="conversation-history")
+            )
+            messages.append(
+                ChatCompletionAssistantMessageParam(role="assistant", content=turn.response)
+            )
+
+        return messages
+
+    @classmethod
+    def get_summary(cls, conversation_id: int) -> dict | None:
+        """Cached summary, None when it has not been loaded in this process yet"""
+        with cls.__lock:
+            return cls.__get_summaries().get(conversation_id)
+
+    @staticmethod
+    def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+        return OpenAITokenizerService.count_tokens(text, model)
+
+    @staticmethod
+    def digest(turn: AIChatTurnDto | dict) -> str:
+        """Identifies a turn across the page and the database, which the page does not know the ids of"""
+        if isinstance(turn, dict):
+            turn = AIChatTurnDto(message=turn["message"], response=turn["response"])
+
+        return hashlib.sha256(f"{turn.message}\x00{turn.response}".encode()).hexdigest()[:32]
+
+    @classmethod
+    def __schedule_update(cls, user_id: int, conversation_id: int, window_start: AIChatTurnDto | None) -> None:
+        # One update per conversation at a time, later turns are picked up by the next message
+        with cls.__lock:
+            if conversation_id in cls.__updating:
+                return
+
+            cls.__updating.add(conversation_id)
+
+        background_executor.submit(cls.__update_summary, user_id, conversation_id, window_start)
+
+    @classmethod
+    def __update_summary(cls, user_id: int, conversation_id: int, window_start: AIChatTurnDto | None) -> None:
+        """Load the stored summary, then fold the stored turns older than the window start into it"""
+        try:
+            database_service = DatabaseService()
+            summary = cls.get_summary(conversation_id)
+
+            if summary is None:
+                summary = database_service.get_conversation_summary(conversation_id) or {
+                    "content": None, "through_id": 0, "last_turn_digest": None,
+                }
+                cls.__set_summary(conversation_id, summary)
+
+            window_digest = cls.digest(window_start) if window_start else None
+            batch_size = st.secrets.get("AI_MEMORY_SUMMARY_BATCH", 20)
+
+            while True:
+                turns = database_service.get_chat_history(
+                    user_id=user_id,
+                    conversation_id=conversation_id,
+                    limit=batch_size,
+                    after_id=summary["through_id"],
+                )
+                reached_window = False
+
+                # Turns of the window and newer, or not saved yet, stay out of the summary
+                for index, turn in enumerate(turns):
+                    if window_digest and cls.digest(turn) == window_digest:
+                        turns = turns[:index]
+                        reached_window = True
+                        break
+
+                if not turns:
+                    return
+
+                summary = cls.__fold(user_id, conversation_id, summary, turns)
+
+                if summary is None or reached_window or len(turns) < batch_size:
+                    return
+        except Exception as e:
+            logger.error(f"[AIConversationMemory] Error updating summary of conversation {conversation_id}: {e}")
+        finally:
+            with cls.__lock:
+                cls.__updating.discard(conversation_id)
+
+    @classmethod
+    def __fold(cls, user_id: int, conversation_id: int, summary: dict, turns: List[dict]) -> dict | None:
+        conversation = "\n".join(
+            f"User: {turn['message']}\nAssistant: {turn['response']}" for turn in turns
+        )
+        max_tokens = st.secrets.get("AI_MEMORY_SUMMARY_MAX_TOKENS", 300)
+
+        response = cls.__get_chat_service().create_chat(
+            OpenAICreateChatDto(
+                messages=[
+                    ChatCompletionSystemMessageParam(
+                        role="system",
+                        content="\n".join([
+                            "You maintain a running summary of a conversation between a user and an assistant.",
+                            "Update the current summary with the new turns, keeping facts, names, decisions and open questions.",
+                            f"Answer with the updated summary only, in no more than {max_tokens * 3 // 4} words.",
+                        ]),
+                        name="profile",
+                    ),
+                    ChatCompletionUserMessageParam(
+                        role="user",
+                        content=f"Current summary:\n{summary['content'] or 'None'}\n\nNew turns:\n{conversation}",
+                        name="conversation",
+                    ),
+                ],
+                model=st.secrets.get("AI_MEMORY_SUMMARY_MODEL", "gpt-4o-mini"),
+                max_tokens=max_tokens,
+                user=str(user_id),
+            ),
+            on_usage=lambda model, usage: OpenAICostLedgerService.record(
+                user_id=user_id, agent="conversation_summary", model=model, usage=usage,
+            ),
+        )
+
+        if response.error:
+            logger.error(f"[AIConversationMemory] Error summarizing conversation {conversation_id}: {response.message}")
+            return None
+
+        summary = {
+            "content": response.data.completion.message.content,
+            "through_id": turns[-1]["id"],
+            "last_turn_digest": cls.digest(turns[-1]),
+        }
+
+        DatabaseService().upsert_conversation_summary(
+            {
+                "conversation_id": conversation_id,
+                "user_id": user_id,
+                **summary,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }
+        )
+        cls.__set_summary(conversation_id, summary)
+
+        logger.info(f"[AIConversationMemory] Summarized conversation {conversation_id} through turn {turns[-1]['id']}")
+
+        return summary
+
+    @classmethod
+    def __set_summary(cls, conversation_id: int, summary: dict) -> None:
+        with cls.__lock:
+            cls.__get_summaries()[conversation_id] = summary
+
+    @classmethod
+    def __get_chat_service(cls) -> OpenAIChatService:
+        if cls.__chat_service is None:
+            cls.__chat_service = OpenAIChatService()
+
+        return cls.__chat_service
+
+    @classmethod
+    def __get_summaries(cls) -> LRUCache:
+        if cls.__summaries is None:
+            cls.__summaries = LRUCache(maxsize=st.secrets.get("AI_MEMORY_SUMMARY_CACHE_SIZE", 1024))
+
+        return cls.__summaries
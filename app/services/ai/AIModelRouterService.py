@@ -0,0 +1,144 @@
+import threading
+import time
+import streamlit as st
+from collections import deque
+from openai.types import CompletionUsage
+from typing import Callable
+
+from app.common.enums.openai import OPENAI_MODEL_COST_ENUM
+from app.common.log import logger
+from app.dtos.ai import AIChatDto
+from app.services.openai import OpenAIService
+
+from .tools import CategoryModelEnum
+
+
+class AIModelRouterService:
+    """
+    Routes chat messages to the cheapest model fitting their category.
+
+    Configured with the AI_MODEL_ROUTING secret, e.g.
+        [AI_MODEL_ROUTING]
+        enabled = true
+        [AI_MODEL_ROUTING.agents."Ripki AI"]
+        overrides = { deep_conversation = "gpt-4o" }
+        allowed_models = ["gpt-4o-mini", "gpt-4o"]
+
+    Without an override a message is never routed to a model pricier than the agent's own,
+    so reasoning models like o1-preview are only used when an override asks for them.
+    """
+
+    __lock = threading.Lock()
+    __decisions: deque = deque(maxlen=1000)
+
+    @classmethod
+    def route(cls, args: AIChatDto, categorize: Callable[[AIChatDto], str]) -> dict:
+        baseline = args.model
+        decision = {
+            "agent": args.agent.name if args.agent else None,
+            "baseline_model": baseline,
+            "model": baseline,
+            "category": None,
+            "reason": "disabled",
+            "classify_ms": 0.0,
+            "started_at": time.monotonic(),
+        }
+        config = cls.__get_agent_config(decision["agent"])
+
+        if not config.get("enabled", False):
+            return decision
+
+        start = time.perf_counter()
+
+        try:
+            category = categorize(args)
+        except Exception as e:
+            logger.error(f"[AIModelRouter] Error categorizing message, using {baseline}: {e}")
+            decision["reason"] = "categorize_failed"
+            return decision
+        finally:
+            decision["classify_ms"] = (time.perf_counter() - start) * 1000
+
+        overrides = config.get("overrides", {})
+        allowed_models = config.get("allowed_models")
+        category_model = CategoryModelEnum.__members__.get(category)
+        candidate = overrides.get(category) or (category_model.value if category_model else baseline)
+
+        decision["category"] = category
+
+        if allowed_models and candidate not in allowed_models:
+            decision["reason"] = "not_allowed"
+        elif category not in overrides and cls.__price(candidate) > cls.__price(baseline):
+            decision["reason"] = "pricier_than_baseline"
+        else:
+            decision["model"] = candidate
+            decision["reason"] = "override" if category in overrides else "category"
+
+        logger.info(
+            f"[AIModelRouter] {decision['agent']} {category} => {decision['model']} "
+            f"({decision['reason']}, baseline {baseline}, classify {decision['classify_ms']:.1f} ms)"
+        )
+
+        return decision
+
+    @classmethod
+    def record_outcome(cls, decision: dict, usage: CompletionUsage) -> None:
+        """Store the decision with its latency and its cost against the fixed-model baseline"""
+        outcome = {
+            **decision,
+            "latency_ms": (time.monotonic() - decision["started_at"]) * 1000,
+            "cost": OpenAIService.calculate_cost(decision["model"], usage)["total"],
+            "baseline_cost": OpenAIService.calculate_cost(decision["baseline_model"], usage)["total"],
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+        }
+
+        with cls.__lock:
+            cls.__decisions.append(outcome)
+
+    @classmethod
+    def get_decisions(cls) -> list[dict]:
+        with cls.__lock:
+            return list(cls.__decisions)
+
+    @classmethod
+    def get_summary(cls) -> dict:
+        """Latency and cost per routed model compared with the baseline models, over recent decisions"""
+        summary = {}
+
+        for decision in cls.get_decisions():
+            key = f"{decision['agent']}:{decision['category']}:{decision['model']}"
+            entry = summary.setdefault(
+                key, {"requests": 0, "latency_ms": 0.0, "classify_ms": 0.0, "cost": 0.0, "baseline_cost": 0.0},
+            )
+
+            entry["requests"] += 1
+            entry["latency_ms"] += decision["latency_ms"]
+            entry["classify_ms"] += decision["classify_ms"]
+            entry["cost"] += decision["cost"]
+            entry["baseline_cost"] += decision["baseline_cost"]
+
+        for entry in summary.values():
+            entry["avg_latency_ms"] = entry.pop("latency_ms") / entry["requests"]
+            entry["avg_classify_ms"] = entry.pop("classify_ms") / entry["requests"]
+            entry["saved_cost"] = entry["baseline_cost"] - entry["cost"]
+
+        return summary
+
+    @staticmethod
+    def __price(model: str) -> float:
+        cost = OPENAI_MODEL_COST_ENUM.get(model)
+        return cost["prompt"] + cost["completion"] if cost else float("inf")
+
+    @staticmethod
+    def __get_agent_config(agent: str) -> dict:
+        routing = st.secrets.get("AI_MODEL_ROUTING", {})
+        config = {
+            "enabled": routing.get("enabled", False),
+            "overrides": routing.get("overrides", {}),
+            "allowed_models": routing.get("allowed_models"),
+        }
+
+        config.update(routing.get("agents", {}).get(agent, {}))
+
+        return config
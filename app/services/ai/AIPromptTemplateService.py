@@ -0,0 +1,92 @@
+import threading
+import streamlit as st
+from cachetools import TTLCache
+from openai.types.chat import (
+    ChatCompletionMessageParam,
+    ChatCompletionSystemMessageParam,
+    ChatCompletionUserMessageParam,
+)
+from typing import Tuple
+
+from app.common.log import logger
+from app.services import DatabaseService
+
+from .AIAgentCatalogService import AIAgentCatalogService
+
+
+class AIPromptTemplateService:
+    """
+    Bounded LRU of compiled agent prompt prefixes keyed by agent id and prompt version.
+
+    Editing a prompt row does not change the agent's version, so entries also expire after
+    AI_PROMPT_TEMPLATE_TTL seconds and edited prompts are picked up within that time.
+    """
+
+    __lock = threading.Lock()
+    __templates: TTLCache = None
+
+    @classmethod
+    def get_agent_prompts(cls, agent_id: int) -> Tuple[ChatCompletionMessageParam, ...]:
+        key = (agent_id, cls.get_prompt_version(agent_id))
+
+        with cls.__lock:
+            templates = cls.__get_templates()
+            compiled = templates.get(key)
+
+        if compiled is not None:
+            return compiled
+
+        compiled = cls.compile(DatabaseService().get_ai_agent_prompts(agent_id))
+
+        # Empty result also means the RPC failed, retry on the next message instead of caching it
+        if compiled:
+            with cls.__lock:
+                templates[key] = compiled
+
+            logger.info(f"[AIPromptTemplate] Compiled {len(compiled)} prompts for agent {agent_id}")
+
+        return compiled
+
+    @classmethod
+    def get_prompt_version(cls, agent_id: int) -> str:
+        agent = AIAgentCatalogService.get_by_id(agent_id)
+        version = agent.get("prompt_version") or agent.get("updated_at")
+
+        return str(version or f"catalog-{AIAgentCatalogService.get_version()}")
+
+    @classmethod
+    def invalidate(cls, agent_id: int = None) -> None:
+        """Drop compiled prompts of one agent, or all agents when agent_id is None"""
+        with cls.__lock:
+            templates = cls.__get_templates()
+
+            for key in list(templates.keys()):
+                if agent_id is None or key[0] == agent_id:
+                    del templates[key]
+
+    @staticmethod
+    def compile(prompts: list[dict]) -> Tuple[ChatCompletionMessageParam, ...]:
+        return tuple(
+            ChatCompletionUserMessageParam(
+                name=prompt["prompt_name"],
+                content=prompt["content"],
+                role="user",
+            )
+            if prompt["role"] == "user"
+            else ChatCompletionSystemMessageParam(
+                name=prompt["prompt_name"],
+                content=prompt["content"],
+                role=prompt["role"],
+            )
+            for prompt in prompts
+        )
+
+    @classmethod
+    def __get_templates(cls) -> TTLCache:
+        if cls.__templates is None:
+            cls.__templates = TTLCache(
+                maxsize=st.secrets.get("AI_PROMPT_TEMPLATE_CACHE_SIZE", 128),
+                ttl=st.secrets.get("AI_PROMPT_TEMPLATE_TTL", 300),
+            )
+
+        return cls.__templates
@@ -1,4 +1,7 @@
 import json
+import streamlit as st
+import threading
+import time
 from openai.types.chat import (
     ChatCompletionMessageParam,
     ChatCompletionSystemMessageParam,
@@ -8,13 +11,20 @@ from openai.types.chat import (
 )
 from typing import List
 
+from app.common.cache import ResponseCache
 from app.common.decorator import func_logger
+from app.common.executor import background_executor
 from app.common.error import BadRequest
 from app.common.log import logger
+from app.common.metrics import latency_registry
 from app.dtos.ai import AIChatDto
 from app.dtos.openai import OpenAICreateChatDto
 from app.services import DatabaseService
-from app.services.openai import OpenAIChatService
+from app.services.openai import OpenAIChatService, OpenAICostLedgerService, OpenAIService
+from .AIConversationMemoryService import AIConversationMemoryService
+from .AIModelRouterService import AIModelRouterService
+from .AIPromptTemplateService import AIPromptTemplateService
+from .MessageClassifierService import MessageClassifierService
 from .tools import (
     CategorizeMessageTool,
     CategoryEnum,
@@ -22,19 +32,25 @@ from .tools import (
 
 
 class AIService:
+    __lock = threading.Lock()
+    __helper_caches: dict[str, ResponseCache] = {}
+
     def __init__(self) -> None:
         self.database_service = DatabaseService()
         self.openai_chat_service = OpenAIChatService()
     
     @func_logger
     def chat(self, args: AIChatDto) -> str:
+        routing = AIModelRouterService.route(args, self.categorize_message)
+        
         response = self.openai_chat_service.create_chat(
             OpenAICreateChatDto(
                 messages=self.get_ai_prompt(args),
-                model=args.model,
+                model=routing["model"],
                 user=str(args.user.id),
                 stream=args.stream,
-            )
+            ),
+            on_usage=self.__record_usage(args.user.id, args.agent.name if args.agent else None, routing),
         )
         
         if response.error:
@@ -44,57 +60,75 @@ class AIService:
     
     @func_logger
     def categorize_message(self, args: AIChatDto) -> str:
-        response = self.openai_chat_service.create_chat(
-            OpenAICreateChatDto(
-                messages=self.get_categorize_message_prompt(args.message),
-                model="gpt-4o-mini",
-                user=args.user.id,
-                tools=[self.get_categorize_message_tool()],
-                tool_choice=ChatCompletionNamedToolChoiceParam(
-                    type="function",
-                    function={"name": "categorize_message"}
-                )
-            )
-        )
+        cache = self.get_helper_cache("categorize_message")
         
-        if response.error:
-            raise BadRequest(f"Failed to get response from OpenAI: {response.message}!")
+        if category := cache.get(args.message):
+            return category
         
-        response = CategorizeMessageTool.model_validate(
-            json.loads(response.data.completion.message.tool_calls[0].function.arguments)
-        ).model_dump()
+        # Answer locally when the classifier is confident, the LLM tool call is the fallback
+        prediction = MessageClassifierService.predict(args.message)
         
-        return response["category"]
+        if MessageClassifierService.is_confident(prediction):
+            MessageClassifierService.count_local_prediction()
+            cache.set(args.message, prediction[0])
+            
+            if MessageClassifierService.should_audit():
+                background_executor.submit(self.__audit_categorization, args, prediction)
+            
+            return prediction[0]
+        
+        category = self.__categorize_with_llm(args)
+        cache.set(args.message, category)
+        MessageClassifierService.record(args.message, category, prediction)
+        
+        return category
 
     @func_logger
     def define_conversation_title(self, message: str) -> str:
+        cache = self.get_helper_cache("define_conversation_title")
+        
+        if title := cache.get(message):
+            return title
+        
         response = self.openai_chat_service.create_chat(
             OpenAICreateChatDto(
                 messages=self.get_define_conversation_title_prompt(message),
                 model="gpt-4o-mini",
-            )
+            ),
+            on_usage=self.__record_usage(None, "define_conversation_title"),
         )
         
         if response.error:
             raise BadRequest(f"Failed to get response from OpenAI: {response.message}!")
         
-        return response.data.completion.message.content.replace('"', "")
+        title = response.data.completion.message.content.replace('"', "")
+        cache.set(message, title)
+        
+        return title
+    
+    @classmethod
+    def get_helper_cache(cls, name: str) -> ResponseCache:
+        """Process-wide response cache of a deterministic helper completion"""
+        if name not in cls.__helper_caches:
+            with cls.__lock:
+                if name not in cls.__helper_caches:
+                    cls.__helper_caches[name] = ResponseCache(
+                        name,
+                        maxsize=st.secrets.get("AI_HELPER_CACHE_SIZE", 2048),
+                        ttl=st.secrets.get("AI_HELPER_CACHE_TTL", 24 * 3600),
+                        fuzzy=st.secrets.get("AI_HELPER_CACHE_FUZZY", False),
+                    )
+        
+        return cls.__helper_caches[name]
 
     @func_logger
     def get_ai_prompt(self, args: AIChatDto) -> List[ChatCompletionMessageParam]:
         prompts = []
         
         if args.agent:
-            ai_agent_prompts = self.database_service.get_ai_agent_prompts(args.agent.id)
-        
-            for prompt in ai_agent_prompts:
-                prompts.append(
-                    {
-                        "name": prompt["prompt_name"], 
-                        "content": prompt["content"], 
-                        "role": prompt["role"]
-                    }
-                )
+            # Identical for every user of the agent and placed before any per-user content,
+            # so it is the prefix the provider prompt cache matches on
+            prompts.extend(AIPromptTemplateService.get_agent_prompts(args.agent.id))
             
         if args.user:
             user_prompt = [
@@ -109,28 +143,28 @@ class AIService:
                 )
             
             prompts.append(
-                {
-                    "content": "\n".join(user_prompt),
-                    "role": "user",
-                    "name": "user-profile",
-                }
+                ChatCompletionUserMessageParam(
+                    content="\n".join(user_prompt),
+                    role="user",
+                    name="user-profile",
+                )
+            )
+        
+        if args.user and args.conversation_id:
+            prompts.extend(
+                AIConversationMemoryService.get_memory(
+                    args.user.id, args.conversation_id, args.history, args.has_older_history, args.model,
+                )
             )
         
         prompts.append(
-            {
-                "content": f"New Message: {args.message}",
-                "role": "user",
-                "name": "new-message",
-            }
+            ChatCompletionUserMessageParam(
+                content=f"New Message: {args.message}",
+                role="user",
+                name="new-message",
+            )
         )
         
-        prompts = [
-            ChatCompletionUserMessageParam(**prompt) 
-            if prompt["role"] == "user" 
-            else ChatCompletionSystemMessageParam(**prompt)
-            for prompt in prompts 
-        ]
-        
         return prompts
     
     def get_categorize_message_prompt(self, message: str) -> List[ChatCompletionMessageParam]:
@@ -191,3 +225,51 @@ class AIService:
                 name="new-message",
             )
         ]
+    
+    def __record_usage(self, user_id: int, agent: str, routing: dict = None):
+        """Usage callback recording into the cost ledger, the routing decisions and latency by prompt cache hit"""
+        start = time.perf_counter()
+        
+        def record(model: str, usage) -> None:
+            OpenAICostLedgerService.record(user_id=user_id, agent=agent, model=model, usage=usage)
+            latency_registry.record(
+                f"AIService.completion[{agent}:{'cache_hit' if OpenAIService.get_cached_tokens(usage) else 'cache_miss'}]",
+                time.perf_counter() - start,
+            )
+            
+            if routing:
+                AIModelRouterService.record_outcome(routing, usage)
+        
+        return record
+    
+    def __categorize_with_llm(self, args: AIChatDto) -> str:
+        response = self.openai_chat_service.create_chat(
+            OpenAICreateChatDto(
+                messages=self.get_categorize_message_prompt(args.message),
+                model="gpt-4o-mini",
+                user=str(args.user.id),
+                tools=[self.get_categorize_message_tool()],
+                tool_choice=ChatCompletionNamedToolChoiceParam(
+                    type="function",
+                    function={"name": "categorize_message"}
+                )
+            ),
+            on_usage=self.__record_usage(args.user.id, "categorize_message"),
+        )
+        
+        if response.error:
+            raise BadRequest(f"Failed to get response from OpenAI: {response.message}!")
+        
+        response = CategorizeMessageTool.model_validate(
+            json.loads(response.data.completion.message.tool_calls[0].function.arguments)
+        ).model_dump()
+        
+        return response["category"]
+    
+    def __audit_categorization(self, args: AIChatDto, prediction: tuple[str, float]) -> None:
+        """Compare a confident local answer with the LLM label, runs in the background"""
+        try:
+            category = self.__categorize_with_llm(args)
+            MessageClassifierService.record(args.message, category, prediction, fallback=False)
+        except Exception as e:
+            logger.error(f"[AIService] Error auditing message categorization: {e}")
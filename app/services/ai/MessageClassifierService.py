@@ -0,0 +1,259 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+import streamlit as st
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from app.common.log import logger
+
+
+class MessageClassifierService:
+    """
+    Local message category classifier trained from logged LLM categorizations.
+
+    The log holds raw user messages. Before each training, which is tried every
+    MESSAGE_CLASSIFIER_RETRAIN_EVERY logged messages, it is compacted to the newest
+    MESSAGE_CLASSIFIER_MAX_SAMPLES_PER_LABEL messages per category that are at most
+    MESSAGE_CLASSIFIER_RETENTION_DAYS old; everything else is deleted from disk.
+    """
+
+    __lock = threading.Lock()
+    __model = None
+    __loaded = False
+    __training = False
+    __metadata: dict = {}
+    __logged_since_training = 0
+    __train_executor: ThreadPoolExecutor = None
+    __stats = {
+        "local_predictions": 0,
+        "fallbacks": 0,
+        "compared": 0,
+        "agreements": 0,
+    }
+
+    @classmethod
+    def predict(cls, message: str) -> tuple[str, float] | None:
+        """Most likely category and its probability, None until a model is trained"""
+        cls.__ensure_loaded()
+        model = cls.__model
+
+        if model is None:
+            return None
+
+        from sklearn import config_context
+
+        # Input is a single trusted string, skip sklearn's per call validation
+        with config_context(assume_finite=True, skip_parameter_validation=True):
+            probabilities = model.predict_proba([message])[0]
+
+        best = probabilities.argmax()
+
+        return str(model.classes_[best]), float(probabilities[best])
+
+    @classmethod
+    def is_confident(cls, prediction: tuple[str, float] | None) -> bool:
+        return bool(prediction) and prediction[1] >= st.secrets.get("MESSAGE_CLASSIFIER_CONFIDENCE", 0.8)
+
+    @classmethod
+    def should_audit(cls) -> bool:
+        """Whether a confident local answer should still be checked against the LLM"""
+        return random.random() < st.secrets.get("MESSAGE_CLASSIFIER_AUDIT_RATE", 0.05)
+
+    @classmethod
+    def count_local_prediction(cls) -> None:
+        with cls.__lock:
+            cls.__stats["local_predictions"] += 1
+
+    @classmethod
+    def record(cls, message: str, category: str, prediction: tuple[str, float] | None, fallback: bool = True) -> None:
+        """Log an LLM categorization as training data and compare it with the local prediction"""
+        log_path = st.secrets.get("MESSAGE_CLASSIFIER_LOG_PATH", "data/categorizations.jsonl")
+
+        with cls.__lock:
+            if fallback:
+                cls.__stats["fallbacks"] += 1
+
+            if prediction:
+                cls.__stats["compared"] += 1
+                cls.__stats["agreements"] += int(prediction[0] == category)
+
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+
+            with open(log_path, "a", encoding="utf-8") as file:
+                file.write(
+                    json.dumps({"message": message, "category": category, "logged_at": time.time()}, ensure_ascii=False)
+                    + "\n"
+                )
+
+            cls.__logged_since_training += 1
+            should_train = (
+                not cls.__training
+                and cls.__logged_since_training >= st.secrets.get("MESSAGE_CLASSIFIER_RETRAIN_EVERY", 200)
+            )
+
+            if should_train:
+                cls.__training = True
+
+        if should_train:
+            cls.__get_train_executor().submit(cls.train)
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Shadow agreement with the LLM labels plus the hold-out accuracy of the last training"""
+        with cls.__lock:
+            stats = dict(cls.__stats)
+
+        stats["llm_agreement"] = stats["agreements"] / stats["compared"] if stats["compared"] else None
+        stats["model"] = dict(cls.__metadata)
+
+        return stats
+
+    @classmethod
+    def train(cls) -> dict:
+        """Fit on the categorization log, keep the model and persist it for the next processes"""
+        try:
+            samples = cls.__compact_log()
+            categories = {sample["category"] for sample in samples}
+
+            if len(samples) < st.secrets.get("MESSAGE_CLASSIFIER_MIN_SAMPLES", 50) or len(categories) < 2:
+                logger.info(f"[MessageClassifier] Not enough samples to train ({len(samples)})")
+                cls.__reset_logged()
+                return {}
+
+            # scikit-learn is only imported when a model is trained
+            import joblib
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.linear_model import LogisticRegression
+            from sklearn.model_selection import train_test_split
+            from sklearn.pipeline import make_pipeline
+
+            messages = [sample["message"] for sample in samples]
+            labels = [sample["category"] for sample in samples]
+
+            def build():
+                return make_pipeline(
+                    TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True, lowercase=True),
+                    LogisticRegression(max_iter=1000, class_weight="balanced"),
+                )
+
+            # Hold-out accuracy against the LLM labels, then refit on everything
+            counts = Counter(labels)
+            stratified = min(counts.values()) >= 2 and math.ceil(len(labels) * 0.2) >= len(counts)
+            train_messages, test_messages, train_labels, test_labels = train_test_split(
+                messages, labels, test_size=0.2, random_state=42, stratify=labels if stratified else None,
+            )
+            accuracy = build().fit(train_messages, train_labels).score(test_messages, test_labels)
+
+            model = build().fit(messages, labels)
+            metadata = {
+                "samples": len(samples),
+                "holdout_accuracy": accuracy,
+                "trained_at": time.time(),
+            }
+
+            model_path = st.secrets.get("MESSAGE_CLASSIFIER_MODEL_PATH", "data/message_classifier.joblib")
+            os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+            joblib.dump({"model": model, "metadata": metadata}, model_path)
+
+            with cls.__lock:
+                cls.__model = model
+                cls.__metadata = metadata
+                cls.__loaded = True
+                cls.__logged_since_training = 0
+
+            logger.info(f"[MessageClassifier] Trained on {len(samples)} samples, hold-out accuracy {accuracy:.3f}")
+
+            return metadata
+        except Exception as e:
+            logger.error(f"[MessageClassifier] Error training classifier: {e}")
+            cls.__reset_logged()
+            return {}
+        finally:
+            with cls.__lock:
+                cls.__training = False
+
+    @classmethod
+    def __reset_logged(cls) -> None:
+        """Wait for another MESSAGE_CLASSIFIER_RETRAIN_EVERY samples before trying again"""
+        with cls.__lock:
+            cls.__logged_since_training = 0
+
+    @classmethod
+    def __get_train_executor(cls) -> ThreadPoolExecutor:
+        # Own single worker so training never queues behind or blocks the shared background tasks
+        with cls.__lock:
+            if cls.__train_executor is None:
+                cls.__train_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="classifier-train")
+
+            return cls.__train_executor
+
+    @classmethod
+    def __ensure_loaded(cls) -> None:
+        if cls.__loaded:
+            return
+
+        with cls.__lock:
+            if cls.__loaded:
+                return
+
+            cls.__loaded = True
+            model_path = st.secrets.get("MESSAGE_CLASSIFIER_MODEL_PATH", "data/message_classifier.joblib")
+
+            if not os.path.exists(model_path):
+                return
+
+            try:
+                import joblib
+
+                saved = joblib.load(model_path)
+                cls.__model = saved["model"]
+                cls.__metadata = saved["metadata"]
+
+                logger.info(f"[MessageClassifier] Loaded classifier: {cls.__metadata}")
+            except Exception as e:
+                logger.error(f"[MessageClassifier] Error loading classifier: {e}")
+
+    @classmethod
+    def __compact_log(cls) -> list[dict]:
+        """Rewrite the log with the samples still retained and return them"""
+        log_path = st.secrets.get("MESSAGE_CLASSIFIER_LOG_PATH", "data/categorizations.jsonl")
+        max_per_label = st.secrets.get("MESSAGE_CLASSIFIER_MAX_SAMPLES_PER_LABEL", 500)
+        now = time.time()
+        oldest = now - st.secrets.get("MESSAGE_CLASSIFIER_RETENTION_DAYS", 90) * 24 * 3600
+
+        if not os.path.exists(log_path):
+            return []
+
+        # Held while rewriting so no record is appended to the replaced file
+        with cls.__lock:
+            by_label = defaultdict(lambda: deque(maxlen=max_per_label))
+
+            with open(log_path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        sample = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+                    # Samples logged before timestamps were recorded start their retention now
+                    sample.setdefault("logged_at", now)
+
+                    if sample["logged_at"] >= oldest:
+                        by_label[sample["category"]].append(sample)
+
+            samples = sorted(
+                (sample for label_samples in by_label.values() for sample in label_samples),
+                key=lambda sample: sample["logged_at"],
+            )
+
+            with open(f"{log_path}.tmp", "w", encoding="utf-8") as file:
+                for sample in samples:
+                    file.write(json.dumps(sample, ensure_ascii=False) + "\n")
+
+            os.replace(f"{log_path}.tmp", log_path)
+
+        return samples
@@ -1 +1,6 @@
+from .AIAgentCatalogService import AIAgentCatalogService
+from .AIConversationMemoryService import AIConversationMemoryService
+from .AIModelRouterService import AIModelRouterService
+from .AIPromptTemplateService import AIPromptTemplateService
 from .AIService import AIService
+from .MessageClassifierService import MessageClassifierService
@@ -1,4 +1,6 @@
-import openai
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletionChunk
+from typing import Callable, Iterator
 
 from app.common.log import logger
 from app.dtos.openai import (
@@ -6,58 +8,57 @@ from app.dtos.openai import (
     OpenAIChatServiceResponse,
     ChatResponse,
 )
-from app.common.enums.openai import OPENAI_MODEL_COST_ENUM
 
+from .OpenAIResilienceService import OpenAIResilienceService
 from .OpenAIService import OpenAIService
+from .OpenAITokenizerService import OpenAITokenizerService
 
 
 class OpenAIChatService(OpenAIService):
-    def create_chat(self, args: OpenAICreateChatDto) -> OpenAIChatServiceResponse:
+    def create_chat(
+        self, args: OpenAICreateChatDto, on_usage: Callable[[str, CompletionUsage], None] = None,
+    ) -> OpenAIChatServiceResponse:
+        """
+        Creates a chat completion.
+
+        Args:
+            args (OpenAICreateChatDto): Chat completion parameters.
+            on_usage (callable): Called with the model and token usage once known,
+                at the end of the stream for streaming completions.
+
+        Returns:
+            OpenAIChatServiceResponse: Completion choice, or the chunk stream when streaming.
+        """
         try:
             logger.info(f"[OPENAI] chat {args.model}")
             
-            args = args.model_dump(exclude_none=True)
-
-            completion = openai.chat.completions.create(
-                **args,
-                timeout=300,
-            )
+            # Fail fast on requests that cannot fit, before paying for them
+            args = OpenAITokenizerService.fit(args)
             
             if args.get("stream", False):
+                # Ask for a final usage chunk so streamed chats are costed too
+                args["stream_options"] = {"include_usage": True}
+                
+                # The stream may come from a hedged request on another model
+                model, completion = OpenAIResilienceService.open_stream(
+                    args["model"], lambda model: self.client.chat.completions.create(**{**args, "model": model}),
+                )
+                
                 logger.info("[OPENAI] [LOG] chat completion streaming response...")
                 return OpenAIChatServiceResponse(
                     error=False,
-                    data=ChatResponse(completion=completion),
+                    data=ChatResponse(completion=self.__stream_with_usage(completion, model, on_usage)),
                     message="Success!",
                 )
-
-            cost = {
-                "prompt": OPENAI_MODEL_COST_ENUM[args["model"]]["prompt"],
-                "completion": OPENAI_MODEL_COST_ENUM[args["model"]]["completion"],
-            }
-
-            prompt_token = completion.usage.prompt_tokens
-            prompt_usage = prompt_token / 1000 * cost["prompt"]
             
-            logger.info(
-                f"[OPENAI] chat prompt token: {prompt_token} ($ {prompt_usage} => Rp {prompt_usage * 15000})"
+            completion = OpenAIResilienceService.call(
+                args["model"], lambda: self.client.chat.completions.create(**args),
             )
 
-            completion_token = completion.usage.completion_tokens
-            completion_usage = completion_token / 1000 * cost["completion"]
+            cost = self.__log_usage(args["model"], completion.usage)
             
-            logger.info(
-                f"[OPENAI] chat completion token: {completion_token} ($ {completion_usage} => Rp {completion_usage * 15000})"
-            )
-
-            total_tokens = completion.usage.total_tokens
-            total_usage = prompt_usage + completion_usage
-            
-            logger.info(
-                f"[OPENAI] chat total tokens: {total_tokens} ($ {total_usage} => Rp {total_usage * 15000})"
-            )
-
-            cost = total_usage * 15000
+            if on_usage:
+                on_usage(args["model"], completion.usage)
 
             logger.info("[OPENAI] [LOG] chat completion response")
             logger.custom_info(
@@ -76,3 +77,41 @@ class OpenAIChatService(OpenAIService):
             )
         except Exception as e:
             return self.handle_openai_exception(e)
+    
+    def __stream_with_usage(
+        self, stream: Iterator[ChatCompletionChunk], model: str, on_usage: Callable = None,
+    ) -> Iterator[ChatCompletionChunk]:
+        """Pass the stream through and report the usage sent in its last chunk"""
+        usage = None
+        
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            
+            yield chunk
+        
+        if not usage:
+            logger.warning(f"[OPENAI] chat stream {model} ended without usage")
+            return
+        
+        self.__log_usage(model, usage)
+        
+        if on_usage:
+            on_usage(model, usage)
+    
+    def __log_usage(self, model: str, usage: CompletionUsage) -> float:
+        """Log token usage and return the total cost in Rupiah"""
+        cost = self.calculate_cost(model, usage)
+        
+        logger.info(
+            f"[OPENAI] chat prompt token: {usage.prompt_tokens}, cached: {self.get_cached_tokens(usage)} "
+            f"($ {cost['prompt']} => Rp {cost['prompt'] * 15000})"
+        )
+        logger.info(
+            f"[OPENAI] chat completion token: {usage.completion_tokens} ($ {cost['completion']} => Rp {cost['completion'] * 15000})"
+        )
+        logger.info(
+            f"[OPENAI] chat total tokens: {usage.total_tokens} ($ {cost['total']} => Rp {cost['total'] * 15000})"
+        )
+        
+        return cost["total"] * 15000
@@ -1,34 +1,43 @@
 import base64
-import openai
-import os
 import requests
-import tempfile
+import streamlit as st
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from openai.types.chat import ChatCompletionUserMessageParam
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Union
 
 from app.common.decorator import func_logger
-from app.common.error import BadRequest
+from app.common.error import BadRequest, ServiceUnavailable
 from app.common.log import logger
 from app.dtos.openai import (
     OpenAICreateChatVisionDto,
     OpenAIChatServiceResponse,
+    OpenAIImagePreprocessDto,
     ChatResponse,
 )
 
+from .OpenAIImagePreprocessService import OpenAIImagePreprocessService
+from .OpenAIResilienceService import OpenAIResilienceService
 from .OpenAIService import OpenAIService
+from .OpenAITokenizerService import OpenAITokenizerService
 
 
 class OpenAIChatVisionService(OpenAIService):
+    __lock = threading.Lock()
+    __session: requests.Session = None
+    __fetch_executor: ThreadPoolExecutor = None
+
     @func_logger
     def create_chat_vision(self, args: OpenAICreateChatVisionDto) -> OpenAIChatServiceResponse:
         try:
             logger.info(f"[OPENAI] chat vision {args.model}")
             
-            args = args.model_dump(exclude_none=True)
+            # Fail fast on requests that cannot fit, before paying for them
+            args = OpenAITokenizerService.fit(args)
 
-            completion = openai.beta.chat.completions.parse(
-                **args,
-                timeout=300,
+            completion = OpenAIResilienceService.call(
+                args["model"], lambda: self.client.beta.chat.completions.parse(**args),
             )
             
             response_format = args.get("response_format")
@@ -66,6 +75,7 @@ class OpenAIChatVisionService(OpenAIService):
         content: Union[List[str], str], 
         image_paths: Union[List[str], str] = None, 
         image_urls: Union[List[str], str] = None,
+        preprocess: OpenAIImagePreprocessDto = None,
     ) -> ChatCompletionUserMessageParam:
         """
         Creates a message dictionary containing images encoded in base64.
@@ -74,11 +84,22 @@ class OpenAIChatVisionService(OpenAIService):
             content (list of str or str): List of str content or str content of the prompt.
             image_paths (list of str or str): List of image file paths or file path.
             image_urls (list of str or str): List of image url or image url.
+            preprocess (OpenAIImagePreprocessDto): Downscale and re-encode images before sending.
 
         Returns:
             dict: Message dictionary ready to be used with the OpenAI API.
         """
-                
+        images = self.load_images(image_paths=image_paths, image_urls=image_urls)
+        
+        return self.create_message_with_image_bytes(content, images, preprocess)
+    
+    def create_message_with_image_bytes(
+        self,
+        content: Union[List[str], str],
+        images: List[bytes],
+        preprocess: OpenAIImagePreprocessDto = None,
+    ) -> ChatCompletionUserMessageParam:
+        """Same as create_message_with_images for images already loaded in memory"""
         content = [
             {
                 "type": "text",
@@ -86,64 +107,155 @@ class OpenAIChatVisionService(OpenAIService):
             }
         ]
         
-        if image_paths:
-            if isinstance(image_paths, str):
-                image_paths = [image_paths]
-                
-            for path in image_paths:
-                content.append(self.__format_image(path, is_path=True))
-                
-        if image_urls:
-            if isinstance(image_urls, str):
-                image_urls = [image_urls]
-                
-            for url in image_urls:
-                content.append(self.__format_image(url))
+        if preprocess:
+            processed_images = [OpenAIImagePreprocessService.preprocess(image, preprocess) for image in images]
+            self.__log_preprocess_stats([processed["stats"] for processed in processed_images])
+        else:
+            processed_images = [
+                {"image": image, "mime": OpenAIImagePreprocessService.detect_mime(image), "detail": None}
+                for image in images
+            ]
+        
+        for processed in processed_images:
+            content.append(self.__format_image(processed["image"], processed["mime"], processed["detail"]))
 
         return ChatCompletionUserMessageParam(
             content=content,
             role="user",
         )
     
-    def __encode_image_to_base64(self, file_path: str) -> str:
+    @func_logger
+    def load_images(
+        self, 
+        image_paths: Union[List[str], str] = None, 
+        image_urls: Union[List[str], str] = None,
+    ) -> List[bytes]:
         """
-        Encodes a given image file to base64.
+        Reads image files and downloads image urls concurrently, keeping the bytes in memory.
 
         Args:
-            file_path (str): Path to the image file.
+            image_paths (list of str or str): List of image file paths or file path.
+            image_urls (list of str or str): List of image url or image url.
 
         Returns:
-            str: Base64 encoded string of the image.
+            list of bytes: Image bytes, paths first then urls, in the given order.
         """
-        with open(file_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        if isinstance(image_paths, str):
+            image_paths = [image_paths]
+        
+        if isinstance(image_urls, str):
+            image_urls = [image_urls]
+        
+        images = [self.__read_image(path) for path in image_paths or []]
+        
+        if image_urls:
+            # Multi-image requests take about as long as the slowest download
+            images.extend(self.__get_fetch_executor().map(self.fetch_image, image_urls))
+        
+        return images
     
-    @func_logger
-    def __format_image(self, image: str, is_path: bool = False) -> Dict:
-        if not is_path:
-            response = requests.get(image)
-            
-            if response.status_code != 200:
-                raise BadRequest(f"OpenAIChatVision Error: Failed to download image from URL: {image}")
-                
-            # Save the image to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                temp_file.write(response.content)
-                temp_file_path = temp_file.name
-            
-            # Encode the image to base64
-            image = self.__encode_image_to_base64(temp_file_path)
-            
-            # Clean up the temporary file
-            os.remove(temp_file_path)
-        else:
-            image = self.__encode_image_to_base64(image)
+    def fetch_image(self, url: str) -> bytes:
+        """
+        Downloads an image through the pooled session, enforcing the size limit while streaming.
 
-        image = f"data:image/png;base64,{image}"
+        Args:
+            url (str): Image url.
+
+        Returns:
+            bytes: Image content.
+        """
+        max_bytes = st.secrets.get("VISION_MAX_IMAGE_BYTES", 20 * 1024 * 1024)
+        
+        try:
+            with self.__get_session().get(
+                url,
+                stream=True,
+                timeout=(
+                    st.secrets.get("VISION_FETCH_CONNECT_TIMEOUT", 5),
+                    st.secrets.get("VISION_FETCH_READ_TIMEOUT", 30),
+                ),
+            ) as response:
+                # Server errors may pass, missing or forbidden images will not
+                if response.status_code >= 500:
+                    raise ServiceUnavailable(
+                        f"OpenAIChatVision Error: Failed to download image from URL: {url} ({response.status_code})"
+                    )
+                
+                if response.status_code != 200:
+                    raise BadRequest(
+                        f"OpenAIChatVision Error: Failed to download image from URL: {url} ({response.status_code})"
+                    )
+                
+                if int(response.headers.get("Content-Length") or 0) > max_bytes:
+                    raise BadRequest(f"OpenAIChatVision Error: Image exceeds {max_bytes} bytes: {url}")
+                
+                image = bytearray()
+                
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    image.extend(chunk)
+                    
+                    if len(image) > max_bytes:
+                        raise BadRequest(f"OpenAIChatVision Error: Image exceeds {max_bytes} bytes: {url}")
+                
+                return bytes(image)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise ServiceUnavailable(f"OpenAIChatVision Error: Failed to download image from URL: {url} ({e})")
+        except requests.RequestException as e:
+            raise BadRequest(f"OpenAIChatVision Error: Failed to download image from URL: {url} ({e})")
+    
+    def __read_image(self, file_path: str) -> bytes:
+        with open(file_path, "rb") as image_file:
+            return image_file.read()
+    
+    def __format_image(self, image: bytes, mime: str = "image/png", detail: str = None) -> Dict:
+        image = base64.b64encode(image).decode("utf-8")
+        image_url = {"url": f"data:{mime};base64,{image}"}
+        
+        if detail:
+            image_url["detail"] = detail
 
         return {
             "type": "image_url",
-            "image_url": {
-                "url": image
-            }
+            "image_url": image_url,
         }
+    
+    def __log_preprocess_stats(self, stats: List[dict]) -> None:
+        original_bytes = sum(stat["original_bytes"] for stat in stats)
+        processed_bytes = sum(stat["processed_bytes"] for stat in stats)
+        original_tokens = sum(stat["original_tokens"] for stat in stats)
+        processed_tokens = sum(stat["processed_tokens"] for stat in stats)
+        
+        logger.info(
+            f"[OPENAI] vision preprocess {len(stats)} images: "
+            f"bytes {original_bytes} => {processed_bytes} (saved {original_bytes - processed_bytes}), "
+            f"estimated image tokens {original_tokens} => {processed_tokens} (saved {original_tokens - processed_tokens})"
+        )
+    
+    @classmethod
+    def __get_session(cls) -> requests.Session:
+        """Process-wide session so image downloads reuse pooled connections"""
+        if cls.__session is None:
+            with cls.__lock:
+                if cls.__session is None:
+                    pool_size = st.secrets.get("VISION_FETCH_POOL_SIZE", 16)
+                    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                    
+                    session = requests.Session()
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    
+                    cls.__session = session
+        
+        return cls.__session
+    
+    @classmethod
+    def __get_fetch_executor(cls) -> ThreadPoolExecutor:
+        if cls.__fetch_executor is None:
+            with cls.__lock:
+                if cls.__fetch_executor is None:
+                    cls.__fetch_executor = ThreadPoolExecutor(
+                        max_workers=st.secrets.get("VISION_FETCH_MAX_WORKERS", 8),
+                        thread_name_prefix="vision-fetch",
+                    )
+        
+        return cls.__fetch_executor
@@ -0,0 +1,96 @@
+import httpx
+import openai
+import threading
+import streamlit as st
+
+from app.common.http import ConnectionTracker
+from app.common.log import logger
+
+
+class OpenAIClientService:
+    """Process-wide OpenAI clients, sync and async, sharing one tuned connection pool each"""
+
+    __lock = threading.Lock()
+    __client: openai.OpenAI = None
+    __async_client: openai.AsyncOpenAI = None
+    __tracker = ConnectionTracker("openai")
+    __async_tracker = ConnectionTracker("openai-async")
+
+    @classmethod
+    def get_client(cls) -> openai.OpenAI:
+        with cls.__lock:
+            if cls.__client is None:
+                logger.info("[OPENAI] Creating shared OpenAI client...")
+
+                cls.__client = openai.OpenAI(
+                    api_key=st.secrets["OPENAI_API_KEY"],
+                    timeout=cls.__get_timeout(),
+                    # Retries are done by OpenAIResilienceService
+                    max_retries=0,
+                    http_client=httpx.Client(
+                        timeout=cls.__get_timeout(),
+                        limits=cls.__get_limits(),
+                        http2=st.secrets.get("OPENAI_HTTP2", True),
+                        event_hooks={"response": [cls.__tracker.on_response]},
+                    ),
+                )
+
+            return cls.__client
+
+    @classmethod
+    def get_async_client(cls) -> openai.AsyncOpenAI:
+        with cls.__lock:
+            if cls.__async_client is None:
+                logger.info("[OPENAI] Creating shared async OpenAI client...")
+
+                async def on_response(response: httpx.Response) -> None:
+                    cls.__async_tracker.on_response(response)
+
+                cls.__async_client = openai.AsyncOpenAI(
+                    api_key=st.secrets["OPENAI_API_KEY"],
+                    timeout=cls.__get_timeout(),
+                    # Retries are done by OpenAIResilienceService
+                    max_retries=0,
+                    http_client=httpx.AsyncClient(
+                        timeout=cls.__get_timeout(),
+                        limits=cls.__get_limits(),
+                        http2=st.secrets.get("OPENAI_HTTP2", True),
+                        event_hooks={"response": [on_response]},
+                    ),
+                )
+
+            return cls.__async_client
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        return {
+            "sync": cls.__tracker.get_stats(),
+            "async": cls.__async_tracker.get_stats(),
+        }
+
+    @classmethod
+    def close(cls) -> None:
+        """Close the sync client, the async client is closed with `await client.close()` by its event loop"""
+        with cls.__lock:
+            if cls.__client is not None:
+                cls.__client.close()
+
+            cls.__client = None
+            cls.__async_client = None
+
+    @staticmethod
+    def __get_timeout() -> httpx.Timeout:
+        # Read timeout bounds the wait between bytes, so long streams are fine but dead sockets fail fast
+        return httpx.Timeout(
+            st.secrets.get("OPENAI_READ_TIMEOUT", 120),
+            connect=st.secrets.get("OPENAI_CONNECT_TIMEOUT", 5),
+            pool=st.secrets.get("OPENAI_POOL_TIMEOUT", 10),
+        )
+
+    @staticmethod
+    def __get_limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=st.secrets.get("OPENAI_POOL_MAX_CONNECTIONS", 50),
+            max_keepalive_connections=st.secrets.get("OPENAI_POOL_MAX_KEEPALIVE", 20),
+            keepalive_expiry=st.secrets.get("OPENAI_POOL_KEEPALIVE_EXPIRY", 60),
+        )
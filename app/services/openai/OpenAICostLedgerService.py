@@ -0,0 +1,141 @@
+import threading
+import time
+import streamlit as st
+from collections import defaultdict
+from datetime import datetime, timezone
+from openai.types import CompletionUsage
+
+from app.common.log import logger
+from app.services.WriteBehindService import WriteBehindService
+
+from .OpenAIService import OpenAIService
+
+
+class OpenAICostLedgerService:
+    """In-memory token and cost ledger per user, agent and model, flushed in batches"""
+
+    __lock = threading.Lock()
+    __totals: dict = defaultdict(dict)
+    __pending: dict = defaultdict(dict)
+    __period_start: datetime = None
+    __last_flush: float = time.monotonic()
+    __fields = (
+        "requests", "prompt_tokens", "cached_tokens", "completion_tokens", "total_tokens", "cost", "cache_savings",
+    )
+
+    @classmethod
+    def record(cls, user_id: int, agent: str, model: str, usage: CompletionUsage) -> None:
+        cost = OpenAIService.calculate_cost(model, usage)
+        entry = {
+            "requests": 1,
+            "prompt_tokens": usage.prompt_tokens,
+            "cached_tokens": OpenAIService.get_cached_tokens(usage),
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+            "cost": cost["total"],
+            "cache_savings": cost["cache_savings"],
+        }
+        key = (user_id, agent, model)
+
+        with cls.__lock:
+            if cls.__period_start is None:
+                cls.__period_start = datetime.now(timezone.utc)
+
+            for ledger in (cls.__totals, cls.__pending):
+                for field, value in entry.items():
+                    ledger[key][field] = ledger[key].get(field, 0) + value
+
+            should_flush = (
+                len(cls.__pending) >= st.secrets.get("COST_LEDGER_FLUSH_SIZE", 50)
+                or time.monotonic() - cls.__last_flush >= st.secrets.get("COST_LEDGER_FLUSH_INTERVAL", 60)
+            )
+
+        if should_flush:
+            cls.flush()
+
+    @classmethod
+    def query(
+        cls,
+        group_by: tuple[str, ...] = ("agent", "model"),
+        user_id: int = None,
+        agent: str = None,
+        model: str = None,
+        order_by: str = "cost",
+        limit: int = 10,
+    ) -> list[dict]:
+        """
+        Aggregates the ledger since process start.
+
+        Args:
+            group_by (tuple of str): Any of "user_id", "agent" and "model".
+            user_id (int), agent (str), model (str): Optional filters.
+            order_by (str): Field to sort by, descending.
+            limit (int): Maximum rows returned.
+
+        Returns:
+            list of dict: Grouped totals, e.g. the most expensive agents and models,
+                with the share of prompt tokens served from the provider prompt cache.
+        """
+        groups = defaultdict(lambda: dict.fromkeys(cls.__fields, 0))
+
+        with cls.__lock:
+            totals = list(cls.__totals.items())
+
+        for (entry_user_id, entry_agent, entry_model), values in totals:
+            entry = {"user_id": entry_user_id, "agent": entry_agent, "model": entry_model}
+
+            if (
+                (user_id is not None and entry_user_id != user_id)
+                or (agent is not None and entry_agent != agent)
+                or (model is not None and entry_model != model)
+            ):
+                continue
+
+            group = groups[tuple(entry[field] for field in group_by)]
+
+            for field in cls.__fields:
+                group[field] += values.get(field, 0)
+
+        rows = [
+            {
+                **dict(zip(group_by, key)),
+                **values,
+                "cached_ratio": values["cached_tokens"] / values["prompt_tokens"] if values["prompt_tokens"] else 0.0,
+            }
+            for key, values in groups.items()
+        ]
+
+        return sorted(rows, key=lambda row: row[order_by], reverse=True)[:limit]
+
+    @classmethod
+    def flush(cls) -> None:
+        """Queue the entries accumulated since the last flush as openai_cost_ledger rows"""
+        with cls.__lock:
+            pending = cls.__pending
+            period_start = cls.__period_start
+            cls.__pending = defaultdict(dict)
+            cls.__period_start = None
+            cls.__last_flush = time.monotonic()
+
+        if not pending:
+            return
+
+        period_end = datetime.now(timezone.utc).isoformat()
+
+        for (user_id, agent, model), values in pending.items():
+            WriteBehindService.enqueue(
+                "openai_cost_ledger",
+                {
+                    "user_id": user_id,
+                    "agent": agent,
+                    "model": model,
+                    **values,
+                    "period_start": period_start.isoformat(),
+                    "period_end": period_end,
+                },
+            )
+
+        logger.info(f"[OPENAI] Flushed {len(pending)} cost ledger entries")
+
+
+WriteBehindService.add_shutdown_hook(OpenAICostLedgerService.flush)
@@ -0,0 +1,273 @@
+import email.utils
+import httpx
+import openai
+import random
+import threading
+import time
+import streamlit as st
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import chain
+from typing import Callable, Iterator, Tuple, TypeVar
+
+from app.common.error import CircuitOpen
+from app.common.log import logger
+from app.common.resilience import CircuitBreaker
+
+T = TypeVar("T")
+
+
+class OpenAIResilienceService:
+    """
+    Retries, per model circuit breakers and stream hedging around OpenAI calls.
+
+    Configured with the OPENAI_RETRY_MAX_ATTEMPTS, OPENAI_RETRY_BASE_DELAY, OPENAI_RETRY_MAX_DELAY,
+    OPENAI_BREAKER_FAILURES, OPENAI_BREAKER_RECOVERY, OPENAI_HEDGE_AFTER (seconds, hedging is off
+    when unset) and OPENAI_HEDGE_FALLBACK_MODELS (model to hedge with, per model) secrets.
+    """
+
+    retryable_status_codes = (408, 409, 429, 500, 502, 503, 504)
+
+    __lock = threading.Lock()
+    __breakers: dict = {}
+    __retry_at: dict = {}
+    __hedge_executor: ThreadPoolExecutor = None
+    __counters = {"retries": 0, "short_circuits": 0, "hedges": 0, "hedge_wins": 0}
+
+    @classmethod
+    def call(cls, model: str, func: Callable[[], T]) -> T:
+        """Run an OpenAI call, retrying transient errors with jittered backoff"""
+        breaker = cls.get_breaker(model)
+        max_attempts = st.secrets.get("OPENAI_RETRY_MAX_ATTEMPTS", 3)
+
+        for attempt in range(max_attempts):
+            if not breaker.allow():
+                cls.__count("short_circuits")
+                raise CircuitOpen(f"[OPENAI] circuit open for {model}")
+
+            try:
+                result = func()
+            except Exception as e:
+                if not cls.is_retryable(e):
+                    # The request was wrong, which says nothing about whether the provider recovered
+                    breaker.release()
+                    raise
+
+                breaker.record_failure()
+                cls.__record_retry_after(model, e)
+                delay = cls.__get_delay(e, attempt)
+
+                if attempt == max_attempts - 1 or delay is None:
+                    raise
+
+                cls.__count("retries")
+                logger.warning(f"[OPENAI] {model} {type(e).__name__}, retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            breaker.record_success()
+            return result
+
+    @classmethod
+    def open_stream(cls, model: str, create: Callable[[str], Iterator]) -> Tuple[str, Iterator]:
+        """
+        Open a chat stream, hedging it when the first chunk is slow.
+
+        Args:
+            model (str): Requested model.
+            create (callable): Opens the stream for a given model.
+
+        Returns:
+            tuple: Model that answered first and its stream, starting with the first chunk.
+        """
+        hedge_after = st.secrets.get("OPENAI_HEDGE_AFTER")
+
+        if not hedge_after:
+            return model, cls.call(model, lambda: cls.__first_chunk(create(model)))
+
+        hedge_model = st.secrets.get("OPENAI_HEDGE_FALLBACK_MODELS", {}).get(model, model)
+        executor = cls.__get_hedge_executor()
+        primary = executor.submit(cls.call, model, lambda: cls.__first_chunk(create(model)))
+        attempts = {primary: model}
+
+        done, _ = wait(attempts, timeout=hedge_after)
+
+        if not done:
+            logger.warning(f"[OPENAI] no first token from {model} after {hedge_after}s, hedging with {hedge_model}")
+            cls.__count("hedges")
+            attempts[executor.submit(cls.call, hedge_model, lambda: cls.__first_chunk(create(hedge_model)))] = hedge_model
+
+        pending = set(attempts)
+        error = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    stream = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+
+                # Close the slower stream whenever it opens
+                for other in pending:
+                    other.add_done_callback(cls.__close_stream)
+
+                if future is not primary:
+                    cls.__count("hedge_wins")
+
+                return attempts[future], stream
+
+        raise error
+
+    @classmethod
+    def get_breaker(cls, model: str) -> CircuitBreaker:
+        with cls.__lock:
+            if model not in cls.__breakers:
+                cls.__breakers[model] = CircuitBreaker(
+                    name=model,
+                    failure_threshold=st.secrets.get("OPENAI_BREAKER_FAILURES", 5),
+                    recovery_timeout=st.secrets.get("OPENAI_BREAKER_RECOVERY", 30),
+                )
+
+            return cls.__breakers[model]
+
+    @classmethod
+    def get_wait(cls, model: str) -> float:
+        """Seconds before `model` should be called again, from its open circuit or the provider's last Retry-After"""
+        with cls.__lock:
+            retry_at = cls.__retry_at.get(model, 0.0)
+
+        return max(retry_at - time.monotonic(), cls.get_breaker(model).get_retry_in(), 0.0)
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        with cls.__lock:
+            stats = dict(cls.__counters)
+            breakers = list(cls.__breakers.values())
+
+        stats["breakers"] = [breaker.get_stats() for breaker in breakers]
+
+        return stats
+
+    @classmethod
+    def is_retryable(cls, exception: Exception) -> bool:
+        if isinstance(exception, (openai.APIConnectionError, httpx.TransportError)):
+            return True
+
+        if isinstance(exception, openai.APIStatusError):
+            return exception.status_code in cls.retryable_status_codes
+
+        return False
+
+    @staticmethod
+    def get_retry_after(exception: Exception) -> float | None:
+        """Seconds the provider asked to wait, from Retry-After-Ms or Retry-After"""
+        response = getattr(exception, "response", None)
+
+        if response is None:
+            return None
+
+        if retry_after_ms := response.headers.get("retry-after-ms"):
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+
+        retry_after = response.headers.get("retry-after")
+
+        if not retry_after:
+            return None
+
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+
+        return max(retry_at.timestamp() - time.time(), 0.0)
+
+    @classmethod
+    def __record_retry_after(cls, model: str, exception: Exception) -> None:
+        try:
+            retry_after = cls.get_retry_after(exception)
+        except (TypeError, ValueError):
+            retry_after = None
+
+        if retry_after:
+            with cls.__lock:
+                cls.__retry_at[model] = max(cls.__retry_at.get(model, 0.0), time.monotonic() + retry_after)
+
+    @classmethod
+    def __get_delay(cls, exception: Exception, attempt: int) -> float | None:
+        """Full jitter backoff, at least the provider's Retry-After, None when that is too long to wait"""
+        base_delay = st.secrets.get("OPENAI_RETRY_BASE_DELAY", 0.5)
+        max_delay = st.secrets.get("OPENAI_RETRY_MAX_DELAY", 20)
+        delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+        try:
+            retry_after = cls.get_retry_after(exception)
+        except (TypeError, ValueError):
+            retry_after = None
+
+        if retry_after is None:
+            return delay
+
+        if retry_after > max_delay:
+            return None
+
+        return max(delay, retry_after)
+
+    @classmethod
+    def __first_chunk(cls, stream: Iterator) -> Iterator:
+        """Wait for the first chunk so slow and failing streams surface here"""
+        iterator = iter(stream)
+
+        try:
+            first = next(iterator)
+        except StopIteration:
+            cls.__close(stream)
+            return iter(())
+        except Exception:
+            cls.__close(stream)
+            raise
+
+        return cls.__close_when_done(chain([first], iterator), stream)
+
+    @classmethod
+    def __close_when_done(cls, chunks: Iterator, stream: Iterator) -> Iterator:
+        """Pass the chunks through, closing the response once they are read or abandoned"""
+        try:
+            yield from chunks
+        finally:
+            cls.__close(stream)
+
+    @staticmethod
+    def __close(stream: Iterator) -> None:
+        if close := getattr(stream, "close", None):
+            close()
+
+    @staticmethod
+    def __close_stream(future: Future) -> None:
+        if future.cancelled() or future.exception():
+            return
+
+        # Drop the underlying response of the losing stream
+        close = getattr(future.result(), "close", None)
+
+        if close:
+            close()
+
+    @classmethod
+    def __get_hedge_executor(cls) -> ThreadPoolExecutor:
+        with cls.__lock:
+            if cls.__hedge_executor is None:
+                cls.__hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="openai-hedge")
+
+            return cls.__hedge_executor
+
+    @classmethod
+    def __count(cls, counter: str) -> None:
+        with cls.__lock:
+            cls.__counters[counter] += 1
@@ -1,20 +1,58 @@
-import openai
-import streamlit as st
+from openai.types import CompletionUsage
 
 from app.common.log import logger
 from app.dtos.openai import OpenAIChatServiceResponse
-from app.common.enums.openai import OPENAI_ERROR_MESSAGE_ENUM
+from app.common.enums.openai import OPENAI_ERROR_MESSAGE_ENUM, OPENAI_MODEL_COST_ENUM
+
+from .OpenAIClientService import OpenAIClientService
 
 
 class OpenAIService:
     def __init__(self):
-        openai.api_key = st.secrets["OPENAI_API_KEY"]
+        self.client = OpenAIClientService.get_client()
         
     def handle_openai_exception(self, exception: Exception) -> OpenAIChatServiceResponse:
-        message = OPENAI_ERROR_MESSAGE_ENUM.get(
-            type(exception).__name__, 
+        # Most specific OpenAI error class first, e.g. RateLimitError before APIError
+        message = next(
+            (
+                OPENAI_ERROR_MESSAGE_ENUM[error_class]
+                for error_class in type(exception).__mro__
+                if error_class in OPENAI_ERROR_MESSAGE_ENUM
+            ),
             f"[OPENAI] service error: {exception}",
         )
 
         logger.error(message)
-        return OpenAIChatServiceResponse(error=True, data={}, message=message)
+        return OpenAIChatServiceResponse(error=True, data={"exception": exception}, message=message)
+
+    @staticmethod
+    def calculate_cost(model: str, usage: CompletionUsage) -> dict:
+        """Token usage cost in USD, zero for models missing from OPENAI_MODEL_COST_ENUM"""
+        cost = OPENAI_MODEL_COST_ENUM.get(model)
+        
+        if not cost:
+            logger.warning(f"[OPENAI] no cost configured for model {model}")
+            cost = {"prompt": 0.0, "completion": 0.0}
+        
+        # Prompt tokens served from the provider prompt cache are billed at half price
+        cached_tokens = OpenAIService.get_cached_tokens(usage)
+        cached_price = cost.get("cached_prompt", cost["prompt"] / 2)
+        
+        prompt_usage = (
+            (usage.prompt_tokens - cached_tokens) / 1000 * cost["prompt"]
+            + cached_tokens / 1000 * cached_price
+        )
+        completion_usage = usage.completion_tokens / 1000 * cost["completion"]
+        
+        return {
+            "prompt": prompt_usage,
+            "completion": completion_usage,
+            "total": prompt_usage + completion_usage,
+            "cache_savings": cached_tokens / 1000 * (cost["prompt"] - cached_price),
+        }
+    
+    @staticmethod
+    def get_cached_tokens(usage: CompletionUsage) -> int:
+        details = usage.prompt_tokens_details
+        
+        return (details.cached_tokens or 0) if details else 0
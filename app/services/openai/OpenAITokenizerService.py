@@ -0,0 +1,275 @@
+import base64
+import json
+import threading
+import time
+import tiktoken
+import streamlit as st
+from cachetools import LRUCache
+from io import BytesIO
+from openai.types.chat import ChatCompletionMessageParam
+from pydantic import BaseModel
+from typing import List
+
+from app.common.enums.openai import OPENAI_MODEL_CONTEXT_ENUM, OPENAI_MODEL_COST_ENUM
+from app.common.error import BadRequest
+from app.common.log import logger
+from app.dtos.openai import OpenAICreateChatDto, OpenAICreateChatVisionDto
+
+from .OpenAIImagePreprocessService import OpenAIImagePreprocessService
+
+
+class OpenAITokenizerService:
+    """
+    Local token counting and pre-flight checks of chat requests.
+
+    Encodings are loaded once per process and model; tiktoken downloads them on first use, set
+    TIKTOKEN_CACHE_DIR to a prepared directory for offline hosts. A failed download is retried after
+    encoding_retry_interval seconds, tokens are estimated from length meanwhile. Token counts of system
+    prompts, the static prefix of every request, are cached. Requests are checked against the model context
+    window and the OPENAI_REQUEST_BUDGET_USD secret (no budget when unset) with the completion priced
+    at its token limit, trimming conversation history first when the request is too long or too expensive.
+    """
+
+    # Message framing tokens of the chat format
+    tokens_per_message = 3
+    tokens_per_name = 1
+    tokens_per_reply = 3
+    # Images given by URL are not downloaded, counted as one high detail 1024x1024 image
+    url_image_tokens = 765
+    trimmable_names = ("conversation-history",)
+    encoding_retry_interval = 60.0
+
+    __lock = threading.Lock()
+    __encodings: dict = {}
+    __failed_at: dict = {}
+    __prompt_tokens: LRUCache = None
+
+    @classmethod
+    def get_encoding(cls, model: str) -> tiktoken.Encoding | None:
+        """Encoding of a model, None when its BPE file can not be loaded"""
+        if model not in cls.__encodings:
+            with cls.__lock:
+                if model not in cls.__encodings:
+                    failed_at = cls.__failed_at.get(model)
+
+                    if failed_at is not None and time.monotonic() - failed_at < cls.encoding_retry_interval:
+                        return None
+
+                    encoding = cls.__load_encoding(model)
+
+                    if encoding is None:
+                        cls.__failed_at[model] = time.monotonic()
+                        return None
+
+                    cls.__encodings[model] = encoding
+                    cls.__failed_at.pop(model, None)
+
+        return cls.__encodings[model]
+
+    @classmethod
+    def count_tokens(cls, text: str, model: str = "gpt-4o-mini") -> int:
+        encoding = cls.get_encoding(model)
+
+        if encoding is None:
+            # About four characters per token
+            return len(text or "") // 4 + 1
+
+        return len(encoding.encode(text or "", disallowed_special=()))
+
+    @classmethod
+    def count_message_tokens(cls, messages: List[ChatCompletionMessageParam], model: str = "gpt-4o-mini") -> int:
+        """Tokens of dumped request messages, content parts are read as lists"""
+        tokens = cls.tokens_per_reply
+
+        for message in messages:
+            tokens += cls.tokens_per_message
+
+            for key, value in message.items():
+                if key == "content" and message.get("role") == "system" and isinstance(value, str):
+                    tokens += cls.__count_prompt_tokens(value, model)
+                elif key == "content" and value is not None and not isinstance(value, str):
+                    tokens += cls.__count_content_parts(value, model)
+                elif key == "tool_calls":
+                    tokens += cls.count_tokens(json.dumps(value, default=str), model)
+                elif isinstance(value, str):
+                    tokens += cls.count_tokens(value, model)
+
+                if key == "name":
+                    tokens += cls.tokens_per_name
+
+        return tokens
+
+    @classmethod
+    def estimate(cls, request: dict) -> dict:
+        """
+        Prompt tokens of a request and its cost in USD, the completion priced at its token limit.
+
+        Args:
+            request (dict): Request parameters, as dumped from OpenAICreateChatDto or OpenAICreateChatVisionDto.
+        """
+        model = request["model"]
+        prompt_tokens = cls.count_message_tokens(request["messages"], model)
+
+        if request.get("tools"):
+            prompt_tokens += cls.count_tokens(json.dumps(request["tools"], default=str), model)
+
+        response_format = request.get("response_format")
+
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            prompt_tokens += cls.count_tokens(json.dumps(response_format.model_json_schema()), model)
+
+        return cls.__price(model, prompt_tokens, request.get("max_tokens"))
+
+    @classmethod
+    def fit(cls, args: OpenAICreateChatDto | OpenAICreateChatVisionDto) -> dict:
+        """
+        Check a request before sending it, trimming the oldest conversation history when it does not fit.
+
+        Returns:
+            dict: Request parameters of `args` without None values, ready to be sent.
+
+        Raises:
+            BadRequest: When the prompt still exceeds the model context or the request budget.
+        """
+        request = args.model_dump(exclude_none=True)
+        # Content parts are validated lazily, read them once into lists of the dump so counting does not consume them
+        request["messages"] = [
+            {**message, "content": list(message["content"])}
+            if message.get("content") is not None and not isinstance(message["content"], (str, list, dict))
+            else message
+            for message in request["messages"]
+        ]
+        estimate = cls.estimate(request)
+        budget = st.secrets.get("OPENAI_REQUEST_BUDGET_USD")
+        # Leave room for at least the requested completion, or a short answer when no limit is set
+        max_prompt_tokens = estimate["context_window"] - (request.get("max_tokens") or 1024)
+
+        if estimate["prompt_tokens"] > max_prompt_tokens or budget and estimate["max_cost"] > budget:
+            request = cls.__trim_history(request, max_prompt_tokens, budget)
+            estimate = cls.estimate(request)
+
+        if estimate["prompt_tokens"] > max_prompt_tokens:
+            raise BadRequest(
+                f"[OPENAI] prompt of {estimate['prompt_tokens']} tokens exceeds the {request['model']} context window"
+            )
+
+        if budget and estimate["max_cost"] > budget:
+            raise BadRequest(
+                f"[OPENAI] estimated request cost $ {estimate['max_cost']:.6f} exceeds the $ {budget} request budget"
+            )
+
+        return request
+
+    @classmethod
+    def __trim_history(cls, request: dict, max_prompt_tokens: int, budget: float) -> dict:
+        """Drop the oldest history turns, a user message and its answer at a time"""
+        messages = list(request["messages"])
+        tokens = cls.estimate(request)["prompt_tokens"]
+        trimmed = 0
+
+        while (
+            tokens > max_prompt_tokens
+            or budget and cls.__price(request["model"], tokens, request.get("max_tokens"))["max_cost"] > budget
+        ):
+            index = next(
+                (i for i, message in enumerate(messages) if message.get("name") in cls.trimmable_names), None,
+            )
+
+            if index is None:
+                break
+
+            end = index + 2 if index + 1 < len(messages) and messages[index + 1]["role"] == "assistant" else index + 1
+            tokens -= cls.count_message_tokens(messages[index:end], request["model"]) - cls.tokens_per_reply
+            del messages[index:end]
+            trimmed += 1
+
+        if trimmed:
+            logger.warning(f"[OPENAI] trimmed {trimmed} history turns to fit {request['model']}")
+
+        return {**request, "messages": messages}
+
+    @staticmethod
+    def __price(model: str, prompt_tokens: int, max_tokens: int = None) -> dict:
+        context = OPENAI_MODEL_CONTEXT_ENUM.get(model, {"context": 128000, "max_output": 4096})
+        completion_tokens = max_tokens or min(context["max_output"], max(context["context"] - prompt_tokens, 0))
+        cost = OPENAI_MODEL_COST_ENUM.get(model, {"prompt": 0.0, "completion": 0.0})
+        prompt_cost = prompt_tokens / 1000 * cost["prompt"]
+
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "context_window": context["context"],
+            "prompt_cost": prompt_cost,
+            "max_cost": prompt_cost + completion_tokens / 1000 * cost["completion"],
+        }
+
+    @classmethod
+    def __count_prompt_tokens(cls, text: str, model: str) -> int:
+        """Token count of a system prompt, cached as the same prompts start every request of an agent"""
+        key = (model, text)
+
+        with cls.__lock:
+            if cls.__prompt_tokens is None:
+                cls.__prompt_tokens = LRUCache(maxsize=st.secrets.get("OPENAI_PROMPT_TOKENS_CACHE_SIZE", 1024))
+
+            tokens = cls.__prompt_tokens.get(key)
+
+        if tokens is None:
+            tokens = cls.count_tokens(text, model)
+
+            # Estimates from length are not kept, the encoding may load later
+            if cls.get_encoding(model) is not None:
+                with cls.__lock:
+                    cls.__prompt_tokens[key] = tokens
+
+        return tokens
+
+    @staticmethod
+    def __load_encoding(model: str) -> tiktoken.Encoding | None:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            pass
+        except Exception as e:
+            logger.error(f"[OPENAI] Error loading tokenizer of {model}, estimating tokens from length: {e}")
+            return None
+
+        try:
+            return tiktoken.get_encoding("o200k_base" if model.startswith(("gpt-4o", "o1")) else "cl100k_base")
+        except Exception as e:
+            logger.error(f"[OPENAI] Error loading tokenizer of {model}, estimating tokens from length: {e}")
+            return None
+
+    @classmethod
+    def __count_content_parts(cls, parts: list, model: str) -> int:
+        tokens = 0
+
+        for part in parts:
+            if part.get("type") == "text":
+                tokens += cls.count_tokens(part["text"], model)
+            elif part.get("type") == "image_url":
+                tokens += cls.__count_image_tokens(part["image_url"])
+
+        return tokens
+
+    @classmethod
+    def __count_image_tokens(cls, image_url: dict) -> int:
+        detail = image_url.get("detail", "auto")
+        url = image_url["url"]
+
+        if detail == "low":
+            return OpenAIImagePreprocessService.estimate_tokens(0, 0, detail)
+
+        if not url.startswith("data:"):
+            return cls.url_image_tokens
+
+        # Pillow reads the dimensions from the header only
+        from PIL import Image
+
+        try:
+            with Image.open(BytesIO(base64.b64decode(url.split(",", 1)[1]))) as image:
+                width, height = image.size
+        except Exception:
+            return cls.url_image_tokens
+
+        return OpenAIImagePreprocessService.estimate_tokens(width, height, detail)
@@ -1,3 +1,23 @@
+import importlib
+
+from .OpenAIClientService import OpenAIClientService
+from .OpenAIResilienceService import OpenAIResilienceService
 from .OpenAIService import OpenAIService
 from .OpenAIChatService import OpenAIChatService
-from .OpenAIChatVisionService import OpenAIChatVisionService
+from .OpenAICostLedgerService import OpenAICostLedgerService
+from .OpenAIImagePreprocessService import OpenAIImagePreprocessService
+from .OpenAITokenizerService import OpenAITokenizerService
+
+# Vision is only used by analytics jobs, load it and its HTTP dependencies on first access
+_lazy_modules = {
+    "OpenAIChatVisionService": ".OpenAIChatVisionService",
+}
+
+
+def __getattr__(name: str):
+    if name in _lazy_modules:
+        value = getattr(importlib.import_module(_lazy_modules[name], __name__), name)
+        globals()[name] = value
+        return value
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
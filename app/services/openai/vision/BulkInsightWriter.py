@@ -0,0 +1,78 @@
+import json
+import os
+import typing
+
+from pydantic import BaseModel
+
+
+class BulkInsightWriter:
+    """Streams extracted rows to JSONL, or to Parquet in row groups, as they finish"""
+
+    def __init__(self, path: str, dto: type[BaseModel], seed_rows: list[dict] = None, row_group_size: int = 100):
+        """
+        Args:
+            path (str): Output file, Parquet when it ends with .parquet and JSONL otherwise.
+            dto (BaseModel): Row schema, used for the Parquet columns.
+            seed_rows (list of dict): Rows of a previous run rewritten first, so a resumed
+                run produces a complete file.
+            row_group_size (int): Parquet rows buffered per row group.
+        """
+        self.path = path
+        self.dto = dto
+        self.row_group_size = row_group_size
+        self.format = "parquet" if path.endswith(".parquet") else "jsonl"
+        self.__rows = []
+        self.__file = None
+        self.__writer = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        if self.format == "jsonl":
+            self.__file = open(path, "w", encoding="utf-8")
+        else:
+            self.__open_parquet()
+
+        for row in seed_rows or []:
+            self.write(row)
+
+    def write(self, row: dict) -> None:
+        if self.format == "jsonl":
+            self.__file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self.__file.flush()
+            return
+
+        self.__rows.append(row)
+
+        if len(self.__rows) >= self.row_group_size:
+            self.__flush_parquet()
+
+    def close(self) -> None:
+        if self.format == "jsonl":
+            self.__file.close()
+            return
+
+        self.__flush_parquet()
+        self.__writer.close()
+
+        # Parquet is only readable once closed, swap it in as a whole
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def __open_parquet(self) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        fields = [pa.field("source", pa.string())]
+
+        for name, field in self.dto.model_fields.items():
+            annotation = typing.get_args(field.annotation) or (field.annotation,)
+            fields.append(pa.field(name, pa.int64() if int in annotation else pa.string()))
+
+        self.__schema = pa.schema(fields)
+        self.__writer = pq.ParquetWriter(f"{self.path}.tmp", self.__schema)
+
+    def __flush_parquet(self) -> None:
+        import pyarrow as pa
+
+        if self.__rows:
+            self.__writer.write_table(pa.Table.from_pylist(self.__rows, schema=self.__schema))
+            self.__rows = []
@@ -1,19 +1,34 @@
 import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Union
 
 from app.common.decorator import func_logger
-from app.common.error import BadRequest
+from app.common.error import CircuitOpen, ServiceUnavailable, UpstreamError
 from app.common.log import logger
-from app.dtos.openai import OpenAICreateChatVisionDto
+from app.common.ratelimit import RateLimiter
+from app.dtos.openai import OpenAICreateChatVisionDto, OpenAIImagePreprocessDto
 from app.dtos.openai.vision import OpenAIInstagramStoryInsightDto
 
 from ..OpenAIChatVisionService import OpenAIChatVisionService
+from ..OpenAIResilienceService import OpenAIResilienceService
+from .BulkInsightWriter import BulkInsightWriter
+from .OpenAIVisionCacheService import OpenAIVisionCacheService
 
 
 class OpenAIImageAnalyticsService(OpenAIChatVisionService):
+    image_extensions = (".png", ".jpg", ".jpeg", ".webp")
+    insight_model = "gpt-4o-2024-08-06"
+
     @func_logger
     def detect_instagram_story_insights(
-        self, image_paths: Union[List[str], str] = None, image_urls: Union[List[str], str] = None,
+        self,
+        image_paths: Union[List[str], str] = None,
+        image_urls: Union[List[str], str] = None,
+        preprocess: OpenAIImagePreprocessDto = None,
+        use_cache: bool = True,
     ) -> dict:
         logger.info("Detecting Instagram Story Insight data...")
            
@@ -23,33 +38,208 @@ class OpenAIImageAnalyticsService(OpenAIChatVisionService):
             "You have to write down every single aspect possible that you found on the image into the given response format.",
             "Fill any missing data by null value.",
         ]
+        model = self.insight_model
+        
+        images = self.load_images(image_paths=image_paths, image_urls=image_urls)
+        
+        # Same screenshot, model, prompt and options always give the same validated result
+        schema_version = OpenAIVisionCacheService.schema_version(OpenAIInstagramStoryInsightDto)
+        cache_key = OpenAIVisionCacheService.make_key(
+            images, model, "\n".join(prompts), preprocess.model_dump_json() if preprocess else "",
+        )
+        
+        if use_cache:
+            result = OpenAIVisionCacheService.get("instagram_story_insights", schema_version, cache_key)
+            
+            if result is not None:
+                logger.info("Instagram Story Insight data served from cache")
+                return result
         
         messages = [
-            self.create_message_with_images(
+            self.create_message_with_image_bytes(
                 content=prompts,
-                image_paths=image_paths,
-                image_urls=image_urls,
+                images=images,
+                preprocess=preprocess,
             )
         ]
         
         response = self.create_chat_vision(
             OpenAICreateChatVisionDto(
                 messages=messages,
-                model="gpt-4o-2024-08-06",
+                model=model,
                 response_format=OpenAIInstagramStoryInsightDto,
                 max_tokens=16000,
             )
         )
         
         if response.error:
-            raise BadRequest(response.message)
+            # Rejected by the open circuit without reaching OpenAI
+            if isinstance(response.data.get("exception"), CircuitOpen):
+                raise response.data["exception"]
+            
+            raise UpstreamError(response.message)
         
         result = OpenAIInstagramStoryInsightDto.model_validate(
             json.loads(response.data.completion.message.content)
         ).model_dump()
         
+        OpenAIVisionCacheService.set("instagram_story_insights", schema_version, cache_key, result)
+        
         logger.info("Success detecting image analytics data!")
         logger.custom_info(result)
         
         return result
-        
\ No newline at end of file
+    
+    def bulk_detect_instagram_story_insights(
+        self,
+        sources: Union[List[str], str],
+        output_path: str,
+        checkpoint_path: str = None,
+        max_workers: int = 4,
+        requests_per_minute: int = 60,
+        max_retries: int = 3,
+        preprocess: OpenAIImagePreprocessDto = None,
+    ) -> dict:
+        """
+        Extracts Instagram story insights from many images, resuming interrupted runs.
+
+        Args:
+            sources (list of str or str): Directory of images, or list of image paths and urls.
+            output_path (str): Result file, Parquet when it ends with .parquet and JSONL otherwise.
+            checkpoint_path (str): JSONL of finished sources, defaults to `<output_path>.checkpoint.jsonl`.
+            max_workers (int): Concurrent extractions.
+            requests_per_minute (int): Request start rate shared by all workers.
+            max_retries (int): Retries per image on transient image download errors, OpenAI errors are
+                retried by OpenAIResilienceService. Calls rejected by an open circuit wait for it and do not count.
+            preprocess (OpenAIImagePreprocessDto): Optional image preprocessing.
+
+        Returns:
+            dict: Run report with counts, throughput and failures.
+        """
+        checkpoint_path = checkpoint_path or f"{output_path}.checkpoint.jsonl"
+        sources = self.__list_sources(sources)
+        done_rows = self.__read_checkpoint(checkpoint_path)
+        pending = [source for source in sources if source not in done_rows]
+        
+        logger.info(
+            f"Bulk detecting Instagram Story Insight data: {len(pending)} pending, {len(done_rows)} already done"
+        )
+        
+        rate_limiter = RateLimiter(requests_per_minute)
+        writer = BulkInsightWriter(output_path, OpenAIInstagramStoryInsightDto, seed_rows=list(done_rows.values()))
+        failures = []
+        succeeded = 0
+        start = time.monotonic()
+        
+        try:
+            with (
+                ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk-insights") as executor,
+                open(checkpoint_path, "a", encoding="utf-8") as checkpoint,
+            ):
+                futures = {
+                    executor.submit(self.__detect_with_retry, source, rate_limiter, max_retries, preprocess): source
+                    for source in pending
+                }
+                
+                # Rows and checkpoints are only written from this thread
+                for future in as_completed(futures):
+                    source = futures[future]
+                    
+                    try:
+                        row = {"source": source, **future.result()}
+                    except Exception as e:
+                        failures.append({"source": source, "error": str(e)})
+                        logger.error(f"Failed detecting Instagram Story Insight data for {source}: {e}")
+                        continue
+                    
+                    checkpoint.write(json.dumps({"source": source, "row": row}, ensure_ascii=False) + "\n")
+                    checkpoint.flush()
+                    writer.write(row)
+                    succeeded += 1
+        finally:
+            writer.close()
+        
+        elapsed = time.monotonic() - start
+        report = {
+            "total": len(sources),
+            "skipped": len(sources) - len(pending),
+            "succeeded": succeeded,
+            "failed": len(failures),
+            "elapsed_seconds": elapsed,
+            "images_per_minute": succeeded / elapsed * 60 if elapsed else 0.0,
+            "failures": failures,
+            "output_path": output_path,
+        }
+        
+        logger.info("Finished bulk detecting Instagram Story Insight data")
+        logger.custom_info(report)
+        
+        return report
+    
+    def __detect_with_retry(
+        self, source: str, rate_limiter: RateLimiter, max_retries: int, preprocess: OpenAIImagePreprocessDto,
+    ) -> dict:
+        is_url = source.startswith(("http://", "https://"))
+        
+        attempt = 0
+        
+        while True:
+            # Back every worker off while the model circuit is open or the provider asked to wait
+            if wait := OpenAIResilienceService.get_wait(self.insight_model):
+                rate_limiter.pause(wait)
+            
+            rate_limiter.acquire()
+            
+            try:
+                return self.detect_instagram_story_insights(
+                    image_paths=None if is_url else source,
+                    image_urls=source if is_url else None,
+                    preprocess=preprocess,
+                )
+            except CircuitOpen:
+                # Another worker runs the half-open trial, wait for the circuit instead of failing the image
+                logger.warning(f"Circuit of {self.insight_model} open, waiting to retry {source}")
+                time.sleep(max(OpenAIResilienceService.get_wait(self.insight_model), rate_limiter.interval, 1.0))
+            except ServiceUnavailable as e:
+                # Download timed out, could not connect or the server failed
+                if attempt == max_retries:
+                    raise
+                
+                delay = min(2 ** attempt, 30) * random.uniform(0.5, 1.5)
+                attempt += 1
+                
+                logger.warning(f"Retrying {source} in {delay:.1f}s after error: {e.message}")
+                time.sleep(delay)
+    
+    def __list_sources(self, sources: Union[List[str], str]) -> List[str]:
+        if isinstance(sources, str) and os.path.isdir(sources):
+            return sorted(
+                os.path.join(sources, name)
+                for name in os.listdir(sources)
+                if name.lower().endswith(self.image_extensions)
+            )
+        
+        if isinstance(sources, str):
+            return [sources]
+        
+        # Keep the first occurrence of duplicated sources
+        return list(dict.fromkeys(sources))
+    
+    def __read_checkpoint(self, checkpoint_path: str) -> dict:
+        """Rows of sources finished by previous runs, keyed by source"""
+        if not os.path.exists(checkpoint_path):
+            return {}
+        
+        done_rows = {}
+        
+        with open(checkpoint_path, encoding="utf-8") as checkpoint:
+            for line in checkpoint:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line of a run killed mid-write
+                    continue
+                
+                done_rows[entry["source"]] = entry["row"]
+        
+        return done_rows
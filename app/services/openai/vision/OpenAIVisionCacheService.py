@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import streamlit as st
+from io import BytesIO
+from pydantic import BaseModel
+from typing import List
+
+from app.common.log import logger
+
+
+class OpenAIVisionCacheService:
+    """Persistent vision extraction results keyed by normalized image content and request"""
+
+    __lock = threading.Lock()
+    __connection: sqlite3.Connection = None
+    __purged_schemas: set = set()
+    __stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @classmethod
+    def make_key(cls, images: List[bytes], *parts: str) -> str:
+        """Hash of the normalized images plus request parts such as model, prompt and options"""
+        digest = hashlib.sha256()
+
+        for image in images:
+            digest.update(cls.__normalize(image))
+
+        for part in parts:
+            digest.update(b"\0" + str(part).encode("utf-8"))
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def schema_version(dto: type[BaseModel]) -> str:
+        """Changes whenever the response model's fields or descriptions change"""
+        schema = json.dumps(dto.model_json_schema(), sort_keys=True)
+        return hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def get(cls, namespace: str, schema_version: str, key: str) -> dict:
+        with cls.__lock:
+            connection = cls.__get_connection()
+            cls.__purge_stale(connection, namespace, schema_version)
+
+            row = connection.execute(
+                "SELECT result FROM results WHERE key = ? AND schema_version = ?", (key, schema_version),
+            ).fetchone()
+
+            if row is None:
+                cls.__stats["misses"] += 1
+                return None
+
+            connection.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            connection.commit()
+            cls.__stats["hits"] += 1
+
+        return json.loads(row[0])
+
+    @classmethod
+    def set(cls, namespace: str, schema_version: str, key: str, result: dict) -> None:
+        result = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+
+        with cls.__lock:
+            connection = cls.__get_connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, namespace, schema_version, result, len(result), now, now),
+            )
+            cls.__evict(connection)
+            connection.commit()
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        with cls.__lock:
+            stats = dict(cls.__stats)
+            entries, size = cls.__get_connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+
+        return {**stats, "entries": entries, "bytes": size}
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls.__lock:
+            connection = cls.__get_connection()
+            connection.execute("DELETE FROM results")
+            connection.commit()
+
+    @staticmethod
+    def __normalize(image: bytes) -> bytes:
+        """Decoded pixels so re-encodes and metadata changes of the same screenshot match"""
+        try:
+            from PIL import Image
+
+            with Image.open(BytesIO(image)) as decoded:
+                decoded = decoded.convert("RGB")
+                return f"{decoded.size}".encode("utf-8") + hashlib.sha256(decoded.tobytes()).digest()
+        except Exception:
+            return hashlib.sha256(image).digest()
+
+    @classmethod
+    def __get_connection(cls) -> sqlite3.Connection:
+        if cls.__connection is None:
+            path = st.secrets.get("VISION_CACHE_PATH", "data/vision_cache.sqlite3")
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+            cls.__connection = sqlite3.connect(path, check_same_thread=False)
+            cls.__connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    schema_version TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            cls.__connection.execute("CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)")
+            cls.__connection.commit()
+
+        return cls.__connection
+
+    @classmethod
+    def __purge_stale(cls, connection: sqlite3.Connection, namespace: str, schema_version: str) -> None:
+        """Drop results stored under an older response schema, once per process"""
+        if (namespace, schema_version) in cls.__purged_schemas:
+            return
+
+        deleted = connection.execute(
+            "DELETE FROM results WHERE namespace = ? AND schema_version != ?", (namespace, schema_version),
+        ).rowcount
+        connection.commit()
+        cls.__purged_schemas.add((namespace, schema_version))
+
+        if deleted:
+            logger.info(f"[VisionCache] Invalidated {deleted} {namespace} results of an older schema")
+
+    @classmethod
+    def __evict(cls, connection: sqlite3.Connection) -> None:
+        """Delete least recently used results beyond the size and entry bounds"""
+        max_bytes = st.secrets.get("VISION_CACHE_MAX_BYTES", 100 * 1024 * 1024)
+        max_entries = st.secrets.get("VISION_CACHE_MAX_ENTRIES", 100000)
+        entries, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+
+        if entries <= max_entries and size <= max_bytes:
+            return
+
+        evicted = 0
+
+        for key, row_size in connection.execute("SELECT key, size FROM results ORDER BY accessed_at").fetchall():
+            if entries <= max_entries and size <= max_bytes:
+                break
+
+            connection.execute("DELETE FROM results WHERE key = ?", (key,))
+            entries -= 1
+            size -= row_size
+            evicted += 1
+
+        cls.__stats["evictions"] += evicted
@@ -1 +1,16 @@
-from .OpenAIImageAnalyticsService import OpenAIImageAnalyticsService
+import importlib
+
+# Loaded on first access, these pull in the vision stack with requests and sqlite3
+_lazy_modules = {
+    "OpenAIImageAnalyticsService": ".OpenAIImageAnalyticsService",
+    "OpenAIVisionCacheService": ".OpenAIVisionCacheService",
+}
+
+
+def __getattr__(name: str):
+    if name in _lazy_modules:
+        value = getattr(importlib.import_module(_lazy_modules[name], __name__), name)
+        globals()[name] = value
+        return value
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
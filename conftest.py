@@ -0,0 +1 @@
+"""Keeps the repository root importable as `app` for the tests."""
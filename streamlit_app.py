@@ -1,11 +1,16 @@
 import rollbar
 import streamlit as st
 import streamlit_option_menu
+import time
 
 from app.common.enums import SidebarEnum
 from app.common.log import logger
-from app.services import PageService, RollbarService
+from app.services import StartupService
 
+rerun_start = time.perf_counter()
+
+# Build the services on a background thread while this rerun sets up the session
+StartupService.start()
 
 # Instantiate session states
 if 'logged_in' not in st.session_state:
@@ -22,6 +27,21 @@ if 'conversation_id' not in st.session_state:
 
 if 'conversation_title' not in st.session_state:
     st.session_state.conversation_title = ""
+
+if 'history_cursor' not in st.session_state:
+    st.session_state.history_cursor = None
+
+if 'history_has_more' not in st.session_state:
+    st.session_state.history_has_more = False
+
+if 'render_window' not in st.session_state:
+    st.session_state.render_window = 0
+
+if 'conversation_search' not in st.session_state:
+    st.session_state.conversation_search = ""
+
+if 'conversation_cursors' not in st.session_state:
+    st.session_state.conversation_cursors = []
     
 if 'page_name' not in st.session_state:
     st.session_state.page_name = ""
@@ -29,12 +49,10 @@ if 'page_name' not in st.session_state:
 if 'agent' not in st.session_state:
     st.session_state.agent = {}
 
-logger.info("[Streamlit] Starting app...")
-
-RollbarService.initialize()
-page_service = PageService()
+# Built once per process, later reruns reuse the same services
+page_service = StartupService.get_page_service()
 
-logger.info("[Streamlit] App initialized!")
+StartupService.record_rerun("overhead", rerun_start)
 
 try:
     # Check if user is logged in
@@ -57,6 +75,11 @@ try:
             st.session_state.messages = []
             st.session_state.conversation_id = ""
             st.session_state.conversation_title = ""
+            st.session_state.history_cursor = None
+            st.session_state.history_has_more = False
+            st.session_state.render_window = 0
+            st.session_state.conversation_search = ""
+            st.session_state.conversation_cursors = []
             st.session_state.page_name = ""
             st.session_state.agent = {}
             st.rerun()
@@ -65,3 +88,5 @@ except Exception as e:
     st.error(str(e))
     logger.error(str(e))
     rollbar.report_exc_info()
+finally:
+    StartupService.record_rerun("total", rerun_start)
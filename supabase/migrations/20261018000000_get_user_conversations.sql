@@ -0,0 +1,47 @@
+-- Conversation index for the chat history page: one row per conversation with
+-- its title, last activity and turn count, newest first, paginated and filterable.
+
+create index if not exists user_chat_titles_user_id_idx
+    on public.user_chat_titles (user_id, id desc);
+
+create index if not exists user_chat_history_conversation_id_idx
+    on public.user_chat_history (conversation_id, id desc);
+
+create or replace function public.get_user_conversations(
+    user_id bigint,
+    search text default null,
+    page_limit integer default 50,
+    page_offset integer default 0
+)
+returns table (
+    id bigint,
+    title text,
+    last_activity_at timestamptz,
+    turn_count bigint
+)
+language sql
+stable
+as $$
+    select
+        titles.id,
+        titles.title,
+        coalesce(history.last_activity_at, titles.created_at) as last_activity_at,
+        history.turn_count
+    from public.user_chat_titles as titles
+    join lateral (
+        select
+            max(chats.created_at) as last_activity_at,
+            count(*) as turn_count
+        from public.user_chat_history as chats
+        where chats.conversation_id = titles.id
+    ) as history on true
+    where titles.user_id = get_user_conversations.user_id
+        and history.turn_count > 0
+        and (
+            get_user_conversations.search is null
+            or titles.title ilike '%' || get_user_conversations.search || '%'
+        )
+    order by last_activity_at desc, titles.id desc
+    limit get_user_conversations.page_limit
+    offset get_user_conversations.page_offset;
+$$;
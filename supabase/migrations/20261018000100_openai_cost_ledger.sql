@@ -0,0 +1,22 @@
+-- Batched token and cost totals per user, agent and model written by OpenAICostLedgerService.
+
+create table if not exists public.openai_cost_ledger (
+    id bigint generated by default as identity primary key,
+    user_id bigint references public.users (id),
+    agent text,
+    model text not null,
+    requests integer not null default 0,
+    prompt_tokens bigint not null default 0,
+    completion_tokens bigint not null default 0,
+    total_tokens bigint not null default 0,
+    cost numeric(12, 6) not null default 0,
+    period_start timestamptz not null,
+    period_end timestamptz not null,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists openai_cost_ledger_agent_model_idx
+    on public.openai_cost_ledger (agent, model, period_end desc);
+
+create index if not exists openai_cost_ledger_user_id_idx
+    on public.openai_cost_ledger (user_id, period_end desc);
@@ -0,0 +1,5 @@
+-- Prompt tokens served from the provider prompt cache and the cost they saved, per ledger entry.
+
+alter table public.openai_cost_ledger
+    add column if not exists cached_tokens bigint not null default 0,
+    add column if not exists cache_savings numeric(12, 6) not null default 0;
@@ -0,0 +1,52 @@
+-- Single round trip login: the password is verified against a salted bcrypt hash
+-- in the database and the projected profile and default agent are returned together.
+
+create extension if not exists pgcrypto with schema extensions;
+
+alter table public.users
+    add column if not exists password_hash text;
+
+update public.users
+set password_hash = extensions.crypt(password, extensions.gen_salt('bf'))
+where password_hash is null
+    and password is not null;
+
+-- The hash is the only stored credential, set it directly for new users:
+--   update public.users set password_hash = extensions.crypt('<password>', extensions.gen_salt('bf')) where ...
+drop trigger if exists users_hash_password on public.users;
+drop function if exists public.hash_user_password();
+
+alter table public.users
+    drop column if exists password;
+
+create or replace function public.login_user(username text, password text)
+returns jsonb
+language sql
+stable
+security definer
+set search_path = public, extensions
+as $$
+    select jsonb_build_object(
+        'user', jsonb_build_object(
+            'id', users.id,
+            'username', users.username,
+            'name', users.name,
+            'language', users.language,
+            'profile', users.profile,
+            'likes', users.likes,
+            'dislikes', users.dislikes
+        ),
+        'agent', (
+            select to_jsonb(agent)
+            from public.get_user_ai_agent(users.id) as agent
+            limit 1
+        )
+    )
+    from public.users
+    where users.username = login_user.username
+        and users.password_hash is not null
+        and users.password_hash = extensions.crypt(login_user.password, users.password_hash);
+$$;
+
+revoke all on function public.login_user(text, text) from public;
+grant execute on function public.login_user(text, text) to anon, authenticated, service_role;
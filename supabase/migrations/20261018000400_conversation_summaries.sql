@@ -0,0 +1,12 @@
+-- Running summary of the turns that left the conversation memory window, kept by
+-- AIConversationMemoryService so it survives restarts and is shared by every process.
+
+create table if not exists public.conversation_summaries (
+    conversation_id bigint primary key references public.user_chat_titles (id) on delete cascade,
+    user_id bigint references public.users (id),
+    content text not null,
+    -- Last user_chat_history row folded into the summary
+    through_id bigint not null,
+    last_turn_digest text not null,
+    updated_at timestamptz not null default now()
+);
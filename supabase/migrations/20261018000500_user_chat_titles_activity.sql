@@ -0,0 +1,99 @@
+-- Keep last activity and turn count on user_chat_titles so the conversation index
+-- pages through an index instead of aggregating every conversation of the user.
+
+alter table public.user_chat_titles
+    add column if not exists last_activity_at timestamptz,
+    add column if not exists turn_count bigint not null default 0;
+
+update public.user_chat_titles as titles
+set
+    last_activity_at = history.last_activity_at,
+    turn_count = history.turn_count
+from (
+    select
+        conversation_id,
+        max(created_at) as last_activity_at,
+        count(*) as turn_count
+    from public.user_chat_history
+    where conversation_id is not null
+    group by conversation_id
+) as history
+where titles.id = history.conversation_id;
+
+-- Statement level so a batched insert updates each conversation once
+create or replace function public.user_chat_history_touch_title()
+returns trigger
+language plpgsql
+as $$
+begin
+    update public.user_chat_titles as titles
+    set
+        last_activity_at = greatest(titles.last_activity_at, inserted.last_activity_at),
+        turn_count = titles.turn_count + inserted.turn_count
+    from (
+        select
+            conversation_id,
+            max(created_at) as last_activity_at,
+            count(*) as turn_count
+        from new_rows
+        where conversation_id is not null
+        group by conversation_id
+    ) as inserted
+    where titles.id = inserted.conversation_id;
+
+    return null;
+end;
+$$;
+
+drop trigger if exists user_chat_history_touch_title on public.user_chat_history;
+
+create trigger user_chat_history_touch_title
+    after insert on public.user_chat_history
+    referencing new table as new_rows
+    for each statement
+    execute function public.user_chat_history_touch_title();
+
+create index if not exists user_chat_titles_activity_idx
+    on public.user_chat_titles (user_id, last_activity_at desc, id desc)
+    where turn_count > 0;
+
+drop function if exists public.get_user_conversations(bigint, text, integer, integer);
+
+-- Keyset pagination: pass the last_activity_at and id of the last row of a page to get the next one
+create or replace function public.get_user_conversations(
+    user_id bigint,
+    search text default null,
+    page_limit integer default 50,
+    before_activity_at timestamptz default null,
+    before_id bigint default null
+)
+returns table (
+    id bigint,
+    title text,
+    last_activity_at timestamptz,
+    turn_count bigint
+)
+language sql
+stable
+as $$
+    select
+        titles.id,
+        titles.title,
+        titles.last_activity_at,
+        titles.turn_count
+    from public.user_chat_titles as titles
+    where titles.user_id = get_user_conversations.user_id
+        and titles.turn_count > 0
+        and (
+            get_user_conversations.before_activity_at is null
+            or (titles.last_activity_at, titles.id)
+                < (get_user_conversations.before_activity_at, get_user_conversations.before_id)
+        )
+        and (
+            get_user_conversations.search is null
+            or titles.title ilike '%' || replace(replace(replace(
+                get_user_conversations.search, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+        )
+    order by titles.last_activity_at desc, titles.id desc
+    limit get_user_conversations.page_limit;
+$$;
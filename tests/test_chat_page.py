@@ -0,0 +1,86 @@
+import time
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest import mock
+
+from streamlit.testing.v1 import AppTest
+
+from app.services import DatabaseService, RollbarService, StartupService, SupabaseClientService
+from app.services.ai import AIAgentCatalogService, AIPromptTemplateService, AIService
+from app.services.openai import OpenAIChatService
+
+USER_DATA = {
+    "id": 1,
+    "username": "ripki",
+    "name": "Ripki",
+    "language": "en",
+    "profile": "",
+    "likes": "",
+    "dislikes": "",
+}
+AGENT = {"id": 1, "name": "Ripki AI", "description": "", "model": "gpt-4o-mini"}
+
+
+def send_first_message(stack: ExitStack, chunks: list, **insert_conversation_title) -> tuple[AppTest, dict]:
+    """Send one message on a new chat with the services mocked, returns the app and the main mocks"""
+    response = SimpleNamespace(error=False, data=SimpleNamespace(completion=iter(chunks)))
+    patches = {
+        "get_client": mock.patch.object(SupabaseClientService, "get_client", return_value=mock.MagicMock()),
+        "initialize": mock.patch.object(RollbarService, "initialize"),
+        "warm_up": mock.patch.object(StartupService, "warm_up"),
+        "get_agents": mock.patch.object(AIAgentCatalogService, "get_agents", return_value=[AGENT]),
+        "get_position": mock.patch.object(AIAgentCatalogService, "get_position", return_value=0),
+        "get_agent_prompts": mock.patch.object(AIPromptTemplateService, "get_agent_prompts", return_value=()),
+        "define_conversation_title": mock.patch.object(AIService, "define_conversation_title", return_value="Greetings"),
+        "create_chat": mock.patch.object(OpenAIChatService, "create_chat", return_value=response),
+        "insert_conversation_title": mock.patch.object(
+            DatabaseService, "insert_conversation_title", **insert_conversation_title,
+        ),
+        "insert_chat_history": mock.patch.object(DatabaseService, "insert_chat_history"),
+        "logger": mock.patch("app.services.PageService.logger"),
+    }
+    mocks = {name: stack.enter_context(patch) for name, patch in patches.items()}
+
+    app = AppTest.from_file("../streamlit_app.py", default_timeout=30)
+    app.secrets["OPENAI_API_KEY"] = "sk-test"
+    app.session_state.logged_in = True
+    app.session_state.user_data = USER_DATA
+    app.session_state.agent = {key: AGENT[key] for key in ("id", "name", "model")}
+    app.run()
+
+    app.chat_input[0].set_value("Hello!").run()
+
+    return app, mocks
+
+
+def test_first_message_of_new_chat_is_answered_and_saved():
+    with ExitStack() as stack:
+        app, mocks = send_first_message(
+            stack, ["Hello", " there!"], return_value={"id": 7, "title": "Greetings"},
+        )
+
+    assert not app.exception
+    assert mocks["create_chat"].call_count == 1
+    assert mocks["insert_conversation_title"].call_count == 1
+    assert mocks["insert_chat_history"].call_count == 1
+    assert mocks["insert_chat_history"].call_args.args[0].response == "Hello there!"
+    assert app.session_state.messages[-1]["content"] == "Hello there!"
+
+
+def test_failed_conversation_title_is_logged_once():
+    def slow_chunks():
+        # Let the failing title future finish while the answer is still streaming
+        for chunk in ["Hello", " there", "!"]:
+            time.sleep(0.1)
+            yield chunk
+
+    with ExitStack() as stack:
+        app, mocks = send_first_message(stack, slow_chunks(), side_effect=RuntimeError("insert failed"))
+
+    errors = [
+        call for call in mocks["logger"].error.call_args_list if "Error creating conversation" in call.args[0]
+    ]
+
+    assert not app.exception
+    assert len(errors) == 1
+    assert app.session_state.messages[-1]["content"] == "Hello there!"